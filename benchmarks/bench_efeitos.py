@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+
+"""
+bench_efeitos.py — Benchmark do modo batch do efeitos.py
+
+Descrição:
+    Gera frases sintéticas reprodutíveis (a partir de uma seed) e mede o débito do modo
+    --batch do efeitos.py, em frases por segundo, com diferentes números de workers.
+    Para cada número de workers regista também o speedup em relação a um único worker,
+    para verificar se o modo batch escala com o número de cores. Os resultados são
+    gravados num ficheiro JSON.
+
+    Exemplo: ./benchmarks/bench_efeitos.py --phrases 50000 --workers 1,2,4
+"""
+
+import os
+import sys
+import argparse
+import io
+import json
+import platform
+import random
+import statistics
+import time
+from contextlib import redirect_stdout
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+import efeitos
+
+# Palavras usadas nas frases geradas
+PALAVRAS = ['ola', 'mundo', 'efeitos', 'texto', 'terminal', 'python', 'diagonal', 'deslizante', 'ação', 'já']
+
+# Gera as frases do benchmark, uma por linha, com 1 a 'palavras' palavras cada
+def gerar_frases(quantidade: int, palavras: int, seed: int) -> str:
+    rng = random.Random(seed)
+    frases = (' '.join(rng.choice(PALAVRAS) for _ in range(rng.randint(1, palavras))) for _ in range(quantidade))
+    return '\n'.join(frases) + '\n'
+
+# Corre o modo batch com o stdout descartado e devolve a duração em segundos
+def correr_batch(texto: str, efeitos_pedidos: tuple[str, ...], workers: int, saida) -> float:
+    inicio = time.perf_counter()
+    with redirect_stdout(saida):
+        efeitos.batch(io.StringIO(texto), efeitos_pedidos, workers)
+    return time.perf_counter() - inicio
+
+# Número de workers por defeito: 1, 2, 4, ... até ao número de CPUs (inclusive)
+def workers_por_defeito() -> list[int]:
+    cpus = os.cpu_count() or 1
+    workers = [1]
+    while workers[-1] * 2 < cpus:
+        workers.append(workers[-1] * 2)
+    if cpus > 1:
+        workers.append(cpus)
+    return workers
+
+# Valida uma lista de inteiros positivos separados por vírgulas
+def lista_workers(valor: str) -> list[int]:
+    try:
+        workers = [int(v) for v in valor.split(',') if v.strip()]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"inválido: {valor}")
+    if not workers or min(workers) < 1:
+        raise argparse.ArgumentTypeError(f"inválido: {valor} (os workers têm de ser maiores que 0)")
+    return workers
+
+def main(opcoes):
+    texto = gerar_frases(opcoes.phrases, opcoes.words, opcoes.seed)
+    print(f"{opcoes.phrases} frases, efeitos {','.join(opcoes.effects)}, {os.cpu_count()} CPUs", flush=True)
+
+    resultados = []
+    with open(os.devnull, 'w') as saida:
+        for workers in opcoes.workers:
+            tempos = [correr_batch(texto, opcoes.effects, workers, saida) for _ in range(opcoes.repeat)]
+            mediana = statistics.median(tempos)
+            r = {
+                'workers': workers,
+                'seconds_min': round(min(tempos), 6),
+                'seconds_median': round(mediana, 6),
+                'phrases_per_second': round(opcoes.phrases / max(mediana, 1e-9)),
+            }
+            r['speedup'] = round(r['phrases_per_second'] / max(resultados[0]['phrases_per_second'], 1), 2) if resultados else 1.0
+            resultados.append(r)
+            print(f"{workers:>3} workers: {mediana * 1000:9.1f} ms, {r['phrases_per_second']:>9} frases/s, "
+                  f"speedup {r['speedup']:.2f}x", flush=True)
+
+    relatorio = {
+        'version': 1,
+        'date': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'phrases': opcoes.phrases,
+        'effects': list(opcoes.effects),
+        'seed': opcoes.seed,
+        'repeat': opcoes.repeat,
+        'results': resultados,
+    }
+    with open(opcoes.output, 'w', encoding='utf-8') as f:
+        json.dump(relatorio, f, indent=2)
+        f.write('\n')
+    print(f"\nResultados gravados em {opcoes.output}")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description="Benchmark do modo batch do efeitos.py (frases por segundo por número de workers)",
+        epilog="Exemplo: ./benchmarks/bench_efeitos.py --phrases 50000 --workers 1,2,4"
+    )
+    parser.add_argument('--phrases', type=int, default=20_000, help='Número de frases geradas. Default 20000')
+    parser.add_argument('--words', type=int, default=6, help='Número máximo de palavras por frase. Default 6')
+    parser.add_argument('--effects', type=efeitos.lista_efeitos, default=tuple(efeitos.EFEITOS),
+                        help='Efeitos aplicados, separados por vírgulas. Default todos')
+    parser.add_argument('--workers', type=lista_workers, default=workers_por_defeito(),
+                        help='Números de workers a medir, separados por vírgulas. Default 1,2,4,... até ao número de CPUs')
+    parser.add_argument('--repeat', type=int, default=3, help='Repetições de cada medição. Default 3')
+    parser.add_argument('--seed', type=int, default=42, help='Seed das frases geradas. Default 42')
+    parser.add_argument('--output', default='bench_efeitos.json', help='Ficheiro JSON dos resultados')
+    opcoes = parser.parse_args()
+
+    if opcoes.phrases < 1 or opcoes.words < 1 or opcoes.repeat < 1:
+        parser.error('--phrases, --words e --repeat têm de ser maiores que 0')
+
+    main(opcoes)
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+
+"""
+bench_treep.py — Benchmark do treep.py sobre árvores sintéticas
+
+Descrição:
+    Gera árvores de diretorias reprodutíveis (a partir de uma seed) numa diretoria
+    temporária, com várias formas e tamanhos, e mede o treep.py em várias operações
+    (árvore completa, -L, -d, -f, -H, --jobs e cache persistente). Para cada caso regista
+    o tempo, as entradas por segundo e o pico de memória, e grava tudo num ficheiro JSON
+    que pode ser comparado com o de outra versão (--compare).
+
+    Exemplo: ./benchmarks/bench_treep.py --sizes pequeno,medio --compare antes.json
+"""
+
+import os
+import sys
+import argparse
+import json
+import platform
+import random
+import statistics
+import tempfile
+import time
+import tracemalloc
+from contextlib import redirect_stdout
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+import treep
+
+# Número aproximado de entradas (diretorias + ficheiros) de cada tamanho
+TAMANHOS = {
+    'pequeno': 1_000,
+    'medio': 10_000,
+    'grande': 100_000,
+}
+
+# Profundidade máxima da forma 'profundo', para não ultrapassar o limite de tamanho de um caminho
+PROFUNDIDADE_MAXIMA = 1000
+
+# Operações medidas: argumentos passados ao treep.py para além da diretoria
+OPERACOES = {
+    'completa': ['-L', '100000', '--no-cache'],
+    'L1': ['-L', '1', '--no-cache'],
+    'L3': ['-L', '3', '--no-cache'],
+    'd': ['-d', '-L', '100000', '--no-cache'],
+    'f': ['-f', '-L', '100000', '--no-cache'],
+    'html': ['-H', '-L', '100000', '--no-cache'],
+    'jobs4': ['-j', '4', '-L', '100000', '--no-cache'],
+    'cache': ['-L', '100000'], # Com a cache já preenchida por uma execução anterior
+}
+
+# Mudanças de desempenho abaixo desta percentagem não são assinaladas no --compare
+TOLERANCIA_COMPARACAO = 0.10
+
+# Cria um ficheiro com o conteúdo dado (vazio por defeito)
+def criar_ficheiro(caminho: str, tamanho: int = 0):
+    with open(caminho, 'wb') as f:
+        f.write(b'x' * tamanho)
+
+# Forma 'largo': quase tudo numa única diretoria, mais algumas subdiretorias vazias
+def gerar_largo(raiz: str, entradas: int, rng: random.Random):
+    diretorias = max(entradas // 100, 1)
+    for i in range(diretorias):
+        os.mkdir(os.path.join(raiz, f'dir{i:05d}'))
+    for i in range(entradas - diretorias):
+        criar_ficheiro(os.path.join(raiz, f'ficheiro{i:06d}.txt'))
+
+# Forma 'profundo': uma cadeia de diretorias, com os ficheiros repartidos pelos níveis
+def gerar_profundo(raiz: str, entradas: int, rng: random.Random):
+    profundidade = min(max(entradas // 10, 1), PROFUNDIDADE_MAXIMA)
+    por_nivel = max(entradas // profundidade - 1, 0)
+    atual = raiz
+    for nivel in range(profundidade):
+        atual = os.path.join(atual, 'd')
+        os.mkdir(atual)
+        for i in range(por_nivel):
+            criar_ficheiro(os.path.join(atual, f'f{i}'))
+
+# Forma 'pequenos': muitas diretorias em dois níveis, cada uma com 100 ficheiros pequenos
+def gerar_pequenos(raiz: str, entradas: int, rng: random.Random):
+    diretorias = max(entradas // 101, 1)
+    grupos = max(int(diretorias ** 0.5), 1)
+    for i in range(diretorias):
+        atual = os.path.join(raiz, f'grupo{i % grupos:03d}', f'dir{i:05d}')
+        os.makedirs(atual)
+        for j in range(100):
+            criar_ficheiro(os.path.join(atual, f'f{j:03d}.dat'), rng.randrange(512))
+
+# Forma 'misto': ramificação e número de ficheiros aleatórios, até 8 níveis
+def gerar_misto(raiz: str, entradas: int, rng: random.Random):
+    restantes = entradas
+    fila = [(raiz, 0)]
+    while fila and restantes > 0:
+        atual, nivel = fila.pop(0)
+        for i in range(min(rng.randint(0, 20), restantes)):
+            criar_ficheiro(os.path.join(atual, f'f{i:02d}'), rng.randrange(4096))
+            restantes -= 1
+        if nivel < 8:
+            for i in range(min(rng.randint(1, 5), restantes)):
+                sub = os.path.join(atual, f'd{i}')
+                os.mkdir(sub)
+                fila.append((sub, nivel + 1))
+                restantes -= 1
+
+FORMAS = {
+    'largo': gerar_largo,
+    'profundo': gerar_profundo,
+    'pequenos': gerar_pequenos,
+    'misto': gerar_misto,
+}
+
+# Gera a árvore e recua o mtime das diretorias, para que fiquem fora da margem de
+# segurança da cache do treep (diretorias alteradas há poucos segundos não são guardadas).
+def gerar_arvore(destino: str, forma: str, entradas: int, seed: int) -> str:
+    raiz = os.path.join(destino, f'{forma}_{entradas}')
+    os.mkdir(raiz)
+    FORMAS[forma](raiz, entradas, random.Random(seed))
+
+    passado = time.time() - 3600
+    for dirpath, _, _ in os.walk(raiz, topdown=False):
+        os.utime(dirpath, (passado, passado))
+    return raiz
+
+# Corre o main() do treep com os argumentos da operação e o stdout descartado.
+# Devolve o número de entradas exibidas.
+def correr_treep(raiz: str, argumentos: list[str], saida) -> int:
+    treep.args = treep.criar_parser().parse_args([raiz, *argumentos])
+    treep.args.diretoria = os.path.abspath(raiz).rstrip(os.sep)
+    with redirect_stdout(saida):
+        arvore = treep.main(treep.args.diretoria)
+    return arvore.total_diretorias + arvore.total_ficheiros
+
+# Mede uma operação: o tempo de várias repetições e, numa execução à parte com o
+# tracemalloc ativo (que torna a execução mais lenta), o pico de memória.
+def medir(raiz: str, operacao: str, repeticoes: int, saida) -> dict:
+    argumentos = OPERACOES[operacao]
+    if operacao == 'cache':
+        correr_treep(raiz, [*argumentos, '--rebuild-cache'], saida)
+
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        entradas = correr_treep(raiz, argumentos, saida)
+        tempos.append(time.perf_counter() - inicio)
+
+    tracemalloc.start()
+    correr_treep(raiz, argumentos, saida)
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    mediana = statistics.median(tempos)
+    return {
+        'entries': entradas,
+        'seconds_min': round(min(tempos), 6),
+        'seconds_median': round(mediana, 6),
+        'entries_per_second': round(entradas / max(mediana, 1e-9)),
+        'peak_memory_bytes': pico,
+    }
+
+# Compara os resultados com os de um ficheiro anterior, caso a caso
+def comparar(resultados: list[dict], ficheiro: str):
+    with open(ficheiro, encoding='utf-8') as f:
+        anteriores = {(r['shape'], r['size'], r['operation']): r for r in json.load(f)['results']}
+
+    print(f"\nComparação com {ficheiro} (entradas/s):")
+    for r in resultados:
+        antigo = anteriores.get((r['shape'], r['size'], r['operation']))
+        if antigo is None:
+            continue
+        razao = r['entries_per_second'] / max(antigo['entries_per_second'], 1)
+        aviso = ''
+        if razao < 1 - TOLERANCIA_COMPARACAO:
+            aviso = '  <-- mais lento'
+        elif razao > 1 + TOLERANCIA_COMPARACAO:
+            aviso = '  <-- mais rápido'
+        print(f"{r['shape']:>9} {r['size']:>8} {r['operation']:>9}: "
+              f"{antigo['entries_per_second']:>10} -> {r['entries_per_second']:>10} ({razao:.2f}x){aviso}")
+
+# Valida uma lista separada por vírgulas contra as opções conhecidas
+def lista(opcoes):
+    def converter(valor: str) -> list[str]:
+        itens = [v.strip() for v in valor.split(',') if v.strip()]
+        invalidos = [v for v in itens if v not in opcoes]
+        if invalidos:
+            raise argparse.ArgumentTypeError(f"inválido: {', '.join(invalidos)} (opções: {', '.join(opcoes)})")
+        return itens
+    return converter
+
+def main(opcoes):
+    resultados = []
+    with tempfile.TemporaryDirectory(prefix='treep_bench_') as temp, open(os.devnull, 'w') as saida:
+        # A cache e os ficheiros .html das execuções ficam dentro da diretoria temporária
+        treep.DIRETORIA_CACHE = os.path.join(temp, 'cache')
+        arvores = os.path.join(temp, 'arvores')
+        os.mkdir(arvores)
+        cwd = os.getcwd()
+        os.chdir(temp)
+        try:
+            for tamanho in opcoes.sizes:
+                for forma in opcoes.shapes:
+                    raiz = gerar_arvore(arvores, forma, TAMANHOS[tamanho], opcoes.seed)
+                    for operacao in opcoes.operations:
+                        r = {'shape': forma, 'size': tamanho, 'operation': operacao,
+                             **medir(raiz, operacao, opcoes.repeat, saida)}
+                        resultados.append(r)
+                        print(f"{forma:>9} {tamanho:>8} {operacao:>9}: {r['entries']:>7} entradas, "
+                              f"{r['seconds_median'] * 1000:9.1f} ms, {r['entries_per_second']:>9} entradas/s, "
+                              f"pico {r['peak_memory_bytes'] / 1024 ** 2:7.1f} MiB", flush=True)
+        finally:
+            os.chdir(cwd)
+
+    relatorio = {
+        'version': 1,
+        'date': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'seed': opcoes.seed,
+        'repeat': opcoes.repeat,
+        'results': resultados,
+    }
+    with open(opcoes.output, 'w', encoding='utf-8') as f:
+        json.dump(relatorio, f, indent=2)
+        f.write('\n')
+    print(f"\nResultados gravados em {opcoes.output}")
+
+    if opcoes.compare:
+        comparar(resultados, opcoes.compare)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description="Benchmark do treep.py sobre árvores de diretorias sintéticas",
+        epilog="Exemplo: ./benchmarks/bench_treep.py --sizes pequeno --compare antes.json"
+    )
+    parser.add_argument('--sizes', type=lista(TAMANHOS), default=['pequeno', 'medio'],
+                        help=f"Tamanhos a gerar, separados por vírgulas ({', '.join(TAMANHOS)}). Default pequeno,medio")
+    parser.add_argument('--shapes', type=lista(FORMAS), default=list(FORMAS),
+                        help=f"Formas a gerar, separadas por vírgulas ({', '.join(FORMAS)}). Default todas")
+    parser.add_argument('--operations', type=lista(OPERACOES), default=list(OPERACOES),
+                        help=f"Operações a medir, separadas por vírgulas ({', '.join(OPERACOES)}). Default todas")
+    parser.add_argument('--repeat', type=int, default=3, help='Repetições de cada medição. Default 3')
+    parser.add_argument('--seed', type=int, default=42, help='Seed das árvores geradas. Default 42')
+    parser.add_argument('--output', default='bench_treep.json', help='Ficheiro JSON dos resultados')
+    parser.add_argument('--compare', metavar='FICHEIRO', help='Comparar com os resultados de outra execução')
+    opcoes = parser.parse_args()
+
+    if opcoes.repeat < 1:
+        parser.error('--repeat tem de ser maior que 0')
+
+    main(opcoes)
@@ -5,8 +5,18 @@ import subprocess
 import sys
 import math
 import argparse
+import asyncio
+import html
+import io
+import json
+import shutil
+import signal
 import time
 from collections import deque
+from collections.abc import Iterator
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from itertools import chain, islice
 
 def main(frase :str, intervalo :float):
 
@@ -24,22 +34,22 @@ def main(frase :str, intervalo :float):
         match opcao.upper():
             case '1':
                 clear_screen()
-                efeito_1(frase)
+                exibir_efeito('1', frase)
             case '2':
                 clear_screen()
-                efeito_2(frase)
+                exibir_efeito('2', frase)
             case '3':
                 clear_screen()
-                efeito_3(frase)
+                exibir_efeito('3', frase)
             case '4':
                 clear_screen()
-                efeito_4(frase)
+                exibir_efeito('4', frase)
             case '5':
                 clear_screen()
-                efeito_5(frase)
+                exibir_efeito('5', frase)
             case '6':
                 clear_screen()
-                efeito_6(frase, intervalo)
+                deslizar(frase, intervalo, args.diff)
             case 'T':
                 # Corre todos os efeitos de texto. Com Pause entre efeitos.
                 clear_screen()
@@ -76,84 +86,520 @@ def clear_screen():
     elif os.name == 'nt':
         subprocess.run(['cls'], shell = True)
 
+# Sequências ANSI usadas pelo renderizador de frames
+CURSOR_INICIO = '\033[H' # Coloca o cursor no canto superior esquerdo
+LIMPAR_ECRA = '\033[2J'
+LIMPAR_ATE_FIM = '\033[J' # Limpa do cursor até ao fim do ecrã
+LIMPAR_LINHA = '\033[K' # Limpa do cursor até ao fim da linha
+ESCONDER_CURSOR = '\033[?25l'
+MOSTRAR_CURSOR = '\033[?25h'
+
+# No modo diferencial, duas zonas alteradas da mesma linha separadas por menos do que este
+# número de células são escritas juntas: reposicionar o cursor custa mais bytes do que repeti-las.
+SALTO_MAXIMO = 8
+
+# Renderizador de frames sem flicker: em vez de limpar o ecrã com o comando 'clear', reescreve
+# o frame por cima do anterior, com cada linha posicionada com o cursor e uma única escrita por
+# frame. No modo diferencial só as células que mudaram em relação ao frame anterior são escritas.
+class Renderizador:
+    def __init__(self, saida=sys.stdout, diferencial: bool = False):
+        self.saida = saida
+        self.diferencial = diferencial
+        self.anterior = None # Linhas do último frame desenhado
+
+    def iniciar(self):
+        self.saida.write(ESCONDER_CURSOR + CURSOR_INICIO + LIMPAR_ECRA)
+        self.saida.flush()
+
+    def desenhar(self, frame: str):
+        linhas = frame.split('\n')
+        if self.diferencial and self.anterior is not None:
+            buffer = self.diferencas(linhas)
+        else:
+            # Cada linha é posicionada diretamente (sem '\n', que fora de um terminal, por exemplo numa
+            # gravação, não volta à coluna 1) e limpa o resto da anterior; no fim limpa o que sobrar
+            # do frame anterior
+            buffer = ''.join(f'\033[{y + 1};1H{linha}{LIMPAR_LINHA}' for y, linha in enumerate(linhas)) + LIMPAR_ATE_FIM
+        self.saida.write(buffer)
+        self.saida.flush()
+        self.anterior = linhas
+
+    # Sequências para atualizar apenas as células alteradas, com o cursor posicionado em cada zona
+    def diferencas(self, linhas: list[str]) -> str:
+        partes = []
+        for y, linha in enumerate(linhas):
+            antiga = self.anterior[y] if y < len(self.anterior) else ''
+            if linha == antiga:
+                continue
+
+            alteradas = [x for x in range(len(linha)) if x >= len(antiga) or linha[x] != antiga[x]]
+            if alteradas:
+                inicio = fim = alteradas[0]
+                for x in alteradas[1:]:
+                    if x - fim > SALTO_MAXIMO:
+                        partes.append(f'\033[{y + 1};{inicio + 1}H{linha[inicio:fim + 1]}')
+                        inicio = x
+                    fim = x
+                partes.append(f'\033[{y + 1};{inicio + 1}H{linha[inicio:fim + 1]}')
+            # A linha nova é mais curta: limpa o resto da antiga
+            if len(antiga) > len(linha):
+                partes.append(f'\033[{y + 1};{len(linha) + 1}H{LIMPAR_LINHA}')
+
+        # O frame novo tem menos linhas: limpa as que sobram
+        if len(self.anterior) > len(linhas):
+            partes.append(f'\033[{len(linhas) + 1};1H{LIMPAR_ATE_FIM}')
+        return ''.join(partes)
+
+    # Deixa o cursor visível, por baixo do último frame
+    def terminar(self):
+        linhas = len(self.anterior) if self.anterior is not None else 0
+        self.saida.write(f'\033[{linhas + 1};1H' + MOSTRAR_CURSOR)
+        self.saida.flush()
+
+# Agendador de frames com prazos absolutos: o frame n é desenhado no instante inicio + n * intervalo,
+# por isso o tempo de desenho não se acumula no intervalo e a animação não se atrasa. Se um frame
+# chegar tarde demais, os frames cujo prazo já passou são contados como perdidos e saltados.
+class Agendador:
+    def __init__(self, intervalo: float):
+        self.intervalo = intervalo
+        self.inicio = time.monotonic()
+        self.proximo = self.inicio
+        self.frames = 0
+        self.perdidos = 0
+
+    # Avança para o prazo do próximo frame. Devolve quanto tempo falta até esse prazo e quantos
+    # passos a animação deve avançar (1, mais os frames perdidos), para que a posição acompanhe
+    # sempre o tempo real.
+    def avancar(self) -> tuple[float, int]:
+        self.frames += 1
+        self.proximo += self.intervalo
+        agora = time.monotonic()
+        if agora < self.proximo:
+            return self.proximo - agora, 1
+
+        atrasados = int((agora - self.proximo) / self.intervalo)
+        self.proximo += atrasados * self.intervalo
+        self.perdidos += atrasados
+        return 0.0, 1 + atrasados
+
+    # Espera pelo prazo do próximo frame e devolve quantos passos a animação deve avançar
+    def esperar(self) -> int:
+        espera, passos = self.avancar()
+        if espera > 0:
+            time.sleep(espera)
+        return passos
+
+    # Tempo do frame atual desde o início, pelo prazo em que foi agendado
+    def decorrido(self) -> float:
+        return self.proximo - self.inicio
+
+    # Os FPS contam os intervalos entre frames: o primeiro frame é desenhado logo no instante 0
+    def resumo(self) -> str:
+        duracao = max(time.monotonic() - self.inicio, 1e-9)
+        fps = (self.frames - 1) / duracao if self.frames > 1 else 0.0
+        return (f"{self.frames} frames em {duracao:.1f}s: {fps:.1f} FPS "
+                f"(objetivo {1 / self.intervalo:.1f} FPS), {self.perdidos} frames perdidos")
+
+# Os efeitos são geradores puros: recebem o texto e a largura disponível e devolvem as linhas
+# (efeitos 1 a 5, cortadas à largura) ou os frames (efeito 6), sem escrever nada no ecrã.
+
 # Efeito Diagonal Esquerda: Exibe cada caracter da string com espaçamento crescente.
-def efeito_1(txt: str):
+def efeito_1(txt: str, largura: int | None = None) -> Iterator[str]:
     for i in range(len(txt)):
-        print(" " * i + txt[i])
+        yield (" " * i + txt[i])[:largura]
 
 # Efeito Diagonal Direita, Texto Invertido:
 # Exibe cada caracter da string invertida com espaçamendo
 # decrescente da direita para a esquerda.
-def efeito_2(txt: str):
+def efeito_2(txt: str, largura: int | None = None) -> Iterator[str]:
     for i in reversed(range(len(txt))):
-        print(" " * i + txt[i])
+        yield (" " * i + txt[i])[:largura]
 
 # Efeito Diagonais Cruzadas:
 # Exibe a string em duplicada na diagonal e invertida.
 # As strings cruzam-se no centro.
-def efeito_3(txt: str):
+def efeito_3(txt: str, largura: int | None = None) -> Iterator[str]:
     size = len(txt)
 
     for i, caracter in enumerate(txt):
         linha = [' '] * size  # Cria uma lista com o tamanho da string
         linha[i] = caracter  # Introduz o caracter na posição da diagonal da esquerda
         linha[size - 1 - i] = caracter # Introduz o caracter da diagonal da direita
-        print(''.join(linha)) # Transforma a lista em string
+        yield ''.join(linha)[:largura] # Transforma a lista em string
 
 # Efeito Diagonal Direita, Palavras Ordem Inversa:
 # Exibe a string na diagonal direita em que a posição
 # das palavras é invertida mas não a ordem dos caracteres
-def efeito_4(txt: str):
-    txt_split = txt.split(" ")[::-1]  # Transfoma a string numa lista e inverte a ordem das palavras
-    counter = 0 # Contador de index dos caracteres
-    for i in range(len(txt),0,-1): # Contagem inversa do número de caracteres para defenir espaçamento
-        print(" "*i + ' '.join(txt_split)[counter])
-        counter += 1
+def efeito_4(txt: str, largura: int | None = None) -> Iterator[str]:
+    # Inverte a ordem das palavras uma única vez; tem o mesmo tamanho que a string original
+    invertida = ' '.join(txt.split(" ")[::-1])
+    for i, caracter in enumerate(invertida): # O espaçamento diminui a cada caracter
+        yield (" " * (len(txt) - i) + caracter)[:largura]
 
 # Efeito em V:
 # Exibe a string em duplicado numa diagonal invertida mas em formato de V em vez de X.
-def efeito_5(txt: str):
+def efeito_5(txt: str, largura: int | None = None) -> Iterator[str]:
     tamanho = len(txt)
     txt_reversed = txt[::-1] # Inverte a ordem dos caracteres da string
     for i in range(tamanho):
         # Exibe os dois valores da string normal e a invertida com espaçamento entre elas proporcional à posição do caracter.
-        print(" " * i + txt[i] + " " * ((tamanho - (i+1))*2)  + txt_reversed[i])
+        yield (" " * i + txt[i] + " " * ((tamanho - (i+1))*2)  + txt_reversed[i])[:largura]
+
+# Largura da linha do efeito deslizante
+LARGURA_DESLIZANTE = 40
 
 # Efeito Deslizante:
-# Exibe a string num ciclo onde a string desliza ao longo da linha e retorna ao início.
+# Devolve um ciclo completo de frames em que a string desliza ao longo da linha e retorna ao início.
 # Usa a data structure Deque para alterar a posição da string.
-def efeito_6(txt: str, timer: float):
+def efeito_6(txt: str, largura: int = LARGURA_DESLIZANTE) -> Iterator[str]:
+    # Completa a string com espaços até à largura da linha e converte-a em deque
+    txtDeque = deque(txt.ljust(largura))
 
-    spaces = 40 - len(txt) # Estabelece o tamanho necessário de espaços para completar 40 caracteres em conjunto com a string
-    txtDeque = deque(list(txt)) # convert a string em lista que depois converte para deque
+    for i in range(len(txtDeque)): # Um frame por cada posição da linha
+        yield "".join(txtDeque) # Frame do deque em string
+        txtDeque.rotate(1) # Transpõe o deque para uma posição á direita
 
-    for i in range(spaces): # Por cada espaço adiciona ao deque para completar os 40 caracteres
-        txtDeque.append(" ")
+    """
+    # SEM DEQUE
 
-    while True:
-        print("".join(txtDeque)) # Exibe o deque em string
-        time.sleep(timer) # Pausa de 0.5s default ou o valor atribuido pelo utilizador
-        txtDeque.rotate(1) # Transpõe o deque para uma posição á direita
-        clear_screen() # Limpa o ecrã
+    txtlist = list(txt.ljust(largura))
 
-        """
-        # SEM DEQUE
+    for i in range(len(txtlist)):
+        yield "".join(txtlist)
+        ultimo = txtlist.pop() # Guarda o ultimo elemento da lista
+        txtlist.insert(0, ultimo) # Adiciona o elemento ao início da lista
+    """
 
-        txtlist = list(txt)
+# Efeitos disponíveis, pelo código da opção no menu
+EFEITOS = {
+    '1': efeito_1,
+    '2': efeito_2,
+    '3': efeito_3,
+    '4': efeito_4,
+    '5': efeito_5,
+    '6': efeito_6,
+}
 
-        for i in range(spaces):
-            txtlist.append(" ")
+# Linhas ou frames de um efeito, guardados numa cache LRU por (efeito, texto, largura):
+# exibir de novo o mesmo efeito com a mesma frase não volta a calcular nada.
+@lru_cache(maxsize=256)
+def gerar_efeito(codigo: str, txt: str, largura: int) -> tuple[str, ...]:
+    return tuple(EFEITOS[codigo](txt, largura))
 
+# Exibe um dos efeitos 1 a 5, cortado à largura do terminal, com uma única escrita
+def exibir_efeito(codigo: str, txt: str):
+    largura = shutil.get_terminal_size().columns
+    print("\n".join(gerar_efeito(codigo, txt, largura)))
+
+# Anima o efeito deslizante: cada frame é desenhado pelo Renderizador por cima do anterior e
+# o Agendador mantém o intervalo certo; Ctrl-C termina o efeito e mostra os FPS conseguidos
+# e os frames perdidos.
+def deslizar(txt: str, timer: float, diferencial: bool = False):
+    frames = gerar_efeito('6', txt, LARGURA_DESLIZANTE)
+    renderizador = Renderizador(diferencial=diferencial)
+    agendador = Agendador(timer) # Pausa de 0.5s default ou o valor atribuido pelo utilizador
+    renderizador.iniciar()
+    frame = 0
+    try:
         while True:
-            print("".join(txtlist))
-            time.sleep(timer) # Pausa de 0.5s default ou o valor atribuido pelo utilizador
-            ultimo = txtlist.pop() # Guarda o ultimo elemento da lista
-            txtlist.insert(0, ultimo) # Adiciona o elemento ao início da lista
-            subprocess.run(['clear']) # limpa o ecrã
-        """
+            renderizador.desenhar(frames[frame])
+            # Avança um frame por cada intervalo (incluindo os perdidos) e volta ao início no fim do ciclo
+            frame = (frame + agendador.esperar()) % len(frames)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        renderizador.terminar()
+    print(agendador.resumo())
+
+# Direções em que as faixas do compositor podem deslizar
+DIRECOES = ('direita', 'esquerda')
+
+# O compositor nunca desenha mais do que este número de frames por segundo
+FPS_MAXIMO = 60
+
+# Faixa do compositor: uma frase que desliza numa linha com largura, velocidade (em colunas por
+# segundo) e direção próprias. A posição é calculada a partir do tempo decorrido, por isso as
+# faixas não precisam de tarefas nem de temporizadores próprios.
+class Faixa:
+    __slots__ = ('texto', 'velocidade', 'direcao', 'largura', 'ciclo', 'fita')
+
+    def __init__(self, texto: str, velocidade: float, direcao: str = 'direita', largura: int = LARGURA_DESLIZANTE):
+        self.texto = texto
+        self.velocidade = velocidade
+        self.direcao = direcao
+        self.largura = largura
+        # A frase completa com espaços até à largura (ou com um espaço de separação, se não couber).
+        # O ciclo nunca é menor do que a largura, por isso duas cópias chegam para qualquer janela.
+        linha = texto.ljust(largura) if len(texto) < largura else texto + ' '
+        self.ciclo = len(linha)
+        self.fita = linha * 2
+
+    # Parte visível da faixa ao fim de 'decorrido' segundos
+    def visivel(self, decorrido: float) -> str:
+        passos = int(decorrido * self.velocidade + 1e-9) % self.ciclo
+        inicio = (self.ciclo - passos) % self.ciclo if self.direcao == 'direita' else passos
+        return self.fita[inicio:inicio + self.largura]
+
+# Cria uma faixa a partir dos valores do --lane: TEXTO [VELOCIDADE [DIRECAO [LARGURA]]]
+def criar_faixa(valores: list[str], velocidade_padrao: float) -> Faixa:
+    if len(valores) > 4:
+        raise ValueError(f"demasiados valores: {' '.join(valores)}")
+    texto = valores[0].upper()
+
+    velocidade = velocidade_padrao
+    if len(valores) > 1:
+        try:
+            velocidade = float(valores[1])
+        except ValueError:
+            raise ValueError(f"velocidade inválida: {valores[1]}")
+        if not 0 <= velocidade < math.inf:
+            raise ValueError(f"a velocidade tem de ser positiva: {valores[1]}")
+
+    direcao = valores[2].lower() if len(valores) > 2 else 'direita'
+    if direcao not in DIRECOES:
+        raise ValueError(f"direção inválida: {valores[2]} (opções: {', '.join(DIRECOES)})")
+
+    largura = LARGURA_DESLIZANTE
+    if len(valores) > 3:
+        if not valores[3].isdigit() or int(valores[3]) < 1:
+            raise ValueError(f"largura inválida: {valores[3]}")
+        largura = int(valores[3])
+
+    return Faixa(texto, velocidade, direcao, largura)
+
+# Frame do compositor: as faixas umas por baixo das outras, na posição correspondente ao tempo decorrido
+def compor_frame(faixas: list[Faixa], decorrido: float) -> str:
+    return '\n'.join(faixa.visivel(decorrido) for faixa in faixas)
+
+# Intervalo entre frames do compositor: o tempo que a faixa mais rápida demora a avançar uma coluna,
+# sem passar de FPS_MAXIMO. O custo de cada frame cresce com as faixas, mas o número de frames não.
+def intervalo_compositor(faixas: list[Faixa], intervalo_padrao: float) -> float:
+    velocidade = max(faixa.velocidade for faixa in faixas)
+    if velocidade == 0: # Nenhuma faixa se mexe
+        return intervalo_padrao
+    return max(1 / velocidade, 1 / FPS_MAXIMO)
+
+# Compositor de várias faixas: um único ciclo asyncio compõe todas as faixas e escreve o frame de
+# uma só vez em cada tick. Termina ao fim de 'frames' frames (se indicado) ou com Ctrl-C, que só
+# pede ao ciclo para parar, para o ecrã ficar sempre num estado limpo. Devolve o Agendador.
+async def compor_faixas(faixas: list[Faixa], intervalo: float, frames: int | None = None,
+                        diferencial: bool = False) -> Agendador:
+    parar = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    try:
+        loop.add_signal_handler(signal.SIGINT, parar.set)
+        sinal = True
+    except (NotImplementedError, RuntimeError): # Windows: o Ctrl-C chega como KeyboardInterrupt
+        sinal = False
+
+    renderizador = Renderizador(diferencial=diferencial)
+    agendador = Agendador(intervalo)
+    renderizador.iniciar()
+    try:
+        while True:
+            renderizador.desenhar(compor_frame(faixas, agendador.decorrido()))
+            espera, _ = agendador.avancar()
+            if frames is not None and agendador.frames >= frames:
+                break
+            if espera > 0:
+                try:
+                    await asyncio.wait_for(parar.wait(), espera)
+                except TimeoutError:
+                    pass
+            # Com Ctrl-C durante a espera termina logo, sem desenhar o próximo frame antes do prazo
+            if parar.is_set():
+                break
+    finally:
+        renderizador.terminar()
+        if sinal:
+            loop.remove_signal_handler(signal.SIGINT)
+    return agendador
+
+# Número de frases de cada bloco enviado a um processo no modo batch
+FRASES_POR_BLOCO = 256
+
+# Texto de um bloco de frases com os efeitos pedidos: para cada frase, as linhas de cada efeito
+# seguidas de uma linha em branco (o efeito 6 dá um ciclo completo de frames, um por linha).
+# Corre nos processos da pool, por isso não usa variáveis globais como args.
+def renderizar_bloco(frases: list[str], efeitos: tuple[str, ...]) -> str:
+    linhas = []
+    for frase in frases:
+        for codigo in efeitos:
+            largura = LARGURA_DESLIZANTE if codigo == '6' else None
+            linhas.extend(gerar_efeito(codigo, frase, largura))
+            linhas.append('')
+    return '\n'.join(linhas) + '\n' if linhas else ''
+
+# Frases de um ficheiro, uma por linha, em maiúsculas como no modo interativo. Ignora linhas vazias.
+def ler_frases(ficheiro) -> Iterator[str]:
+    for linha in ficheiro:
+        frase = linha.rstrip('\r\n')
+        if frase.strip():
+            yield frase.upper()
+
+# Divide as frases em blocos de até 'tamanho' frases, sem as ler todas para memória
+def dividir_blocos(frases: Iterator[str], tamanho: int) -> Iterator[list[str]]:
+    while bloco := list(islice(frases, tamanho)):
+        yield bloco
+
+# Modo batch: aplica os efeitos a todas as frases do ficheiro e escreve o
+# resultado no stdout à medida que fica pronto, pela ordem das frases. Com mais de um worker os
+# blocos são renderizados numa pool de processos; só há poucos blocos à espera de serem escritos
+# de cada vez, por isso o input pode ser maior do que a memória.
+def batch(ficheiro, efeitos: tuple[str, ...], workers: int):
+    blocos = dividir_blocos(ler_frases(ficheiro), FRASES_POR_BLOCO)
+
+    # Um input que cabe num só bloco não compensa o arranque da pool
+    primeiro = next(blocos, [])
+    if workers == 1 or len(primeiro) < FRASES_POR_BLOCO:
+        for bloco in chain([primeiro], blocos):
+            sys.stdout.write(renderizar_bloco(bloco, efeitos))
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pendentes = deque()
+        for bloco in chain([primeiro], blocos):
+            pendentes.append(pool.submit(renderizar_bloco, bloco, efeitos))
+            if len(pendentes) >= workers * 2:
+                sys.stdout.write(pendentes.popleft().result())
+        while pendentes:
+            sys.stdout.write(pendentes.popleft().result())
+
+# Valida a lista de efeitos do --effect, separados por vírgulas (ex.: 3,5)
+def lista_efeitos(valor: str) -> tuple[str, ...]:
+    efeitos = tuple(e.strip() for e in valor.split(',') if e.strip())
+    invalidos = [e for e in efeitos if e not in EFEITOS]
+    if not efeitos or invalidos:
+        raise argparse.ArgumentTypeError(f"efeitos inválidos: {valor} (opções: {', '.join(EFEITOS)})")
+    return efeitos
+
+# Formatos do --record, pela extensão do ficheiro
+FORMATOS_GRAVACAO = {
+    '.cast': 'cast',
+    '.ansi': 'ansi',
+    '.ans': 'ansi',
+    '.html': 'html',
+    '.htm': 'html',
+}
+
+# Altura de cada linha na animação HTML, em em
+ALTURA_LINHA_HTML = 1.2
+
+# Frames de um efeito para gravação, como (duração, frame), sem esperas reais. Os efeitos 1 a 5
+# aparecem linha a linha; o efeito 6 dá 'frames' frames (por defeito um ciclo completo).
+def frames_efeito(codigo: str, txt: str, intervalo: float, frames: int | None = None) -> Iterator[tuple[float, str]]:
+    if codigo == '6':
+        ciclo = gerar_efeito('6', txt, LARGURA_DESLIZANTE)
+        for i in range(frames or len(ciclo)):
+            yield intervalo, ciclo[i % len(ciclo)]
+        return
+
+    linhas = gerar_efeito(codigo, txt, None)
+    for i in range(1, len(linhas) + 1):
+        yield intervalo, '\n'.join(linhas[:i])
+
+# Frames do compositor para gravação. Por defeito grava o tempo que a faixa mais lenta
+# demora a dar uma volta completa.
+def frames_faixas(faixas: list[Faixa], intervalo: float, frames: int | None = None) -> Iterator[tuple[float, str]]:
+    if frames is None:
+        voltas = [faixa.ciclo / faixa.velocidade for faixa in faixas if faixa.velocidade > 0]
+        frames = math.ceil(max(voltas) / intervalo) if voltas else 1
+    for i in range(frames):
+        yield intervalo, compor_frame(faixas, i * intervalo)
+
+# Junta os frames seguidos iguais, somando as durações, e limita a duração de cada frame a
+# idle_max segundos, para a gravação não ter esperas longas sem nada a mudar.
+def compactar_frames(frames, idle_max: float | None = None) -> list[tuple[float, str]]:
+    compactados = []
+    for duracao, frame in frames:
+        if compactados and compactados[-1][1] == frame:
+            compactados[-1][0] += duracao
+        else:
+            compactados.append([duracao, frame])
+    if idle_max is not None:
+        for par in compactados:
+            par[0] = min(par[0], idle_max)
+    return [(duracao, frame) for duracao, frame in compactados]
+
+# Sequências ANSI de cada frame, como (instante, dados), geradas pelo Renderizador para um buffer
+# em memória. O último evento volta a mostrar o cursor, no instante em que a gravação termina.
+def eventos_ansi(frames: list[tuple[float, str]], diferencial: bool = False) -> Iterator[tuple[float, str]]:
+    buffer = io.StringIO()
+    renderizador = Renderizador(buffer, diferencial)
+
+    def recolher() -> str:
+        dados = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return dados
+
+    renderizador.iniciar()
+    tempo = 0.0
+    for duracao, frame in frames:
+        renderizador.desenhar(frame)
+        yield tempo, recolher()
+        tempo += duracao
+    renderizador.terminar()
+    yield tempo, recolher()
+
+# Gravação em asciicast v2: um cabeçalho JSON e um evento [instante, "o", dados] por linha
+def escrever_cast(frames: list[tuple[float, str]], f, largura: int, altura: int,
+                  titulo: str, diferencial: bool, idle_max: float | None):
+    cabecalho = {'version': 2, 'width': largura, 'height': altura + 1, 'timestamp': int(time.time()), 'title': titulo}
+    if idle_max is not None:
+        cabecalho['idle_time_limit'] = idle_max
+    f.write(json.dumps(cabecalho, ensure_ascii=False) + '\n')
+    for tempo, dados in eventos_ansi(frames, diferencial):
+        f.write(json.dumps([round(tempo, 6), 'o', dados], ensure_ascii=False) + '\n')
+
+# Animação HTML/CSS: todos os frames, com a mesma altura, ficam uns por baixo dos outros numa
+# fita dentro de uma janela do tamanho de um frame. Um único @keyframes com step-end desloca a
+# fita de frame em frame, com a duração de cada um.
+def escrever_html(frames: list[tuple[float, str]], f, largura: int, altura: int, titulo: str):
+    total = sum(duracao for duracao, _ in frames)
+    passos = []
+    tempo = 0.0
+    for i, (duracao, _) in enumerate(frames):
+        passos.append(f"{tempo / total * 100:.4f}% {{ transform: translateY({-i * altura * ALTURA_LINHA_HTML:.4f}em); }}")
+        tempo += duracao
+    passos.append(f"100% {{ transform: translateY({-(len(frames) - 1) * altura * ALTURA_LINHA_HTML:.4f}em); }}")
+
+    f.write(f"<!DOCTYPE html>\n<html><head><meta charset='utf-8'><title>{html.escape(titulo)}</title>\n<style>\n")
+    f.write("body { background: #111; }\n")
+    f.write(f".ecra {{ width: {largura}ch; height: {altura * ALTURA_LINHA_HTML:.4f}em; overflow: hidden; "
+            f"background: #000; color: #ddd; font: 16px/{ALTURA_LINHA_HTML}em monospace; }}\n")
+    f.write(f".fita {{ margin: 0; font: inherit; animation: efeitos {total:.6f}s step-end infinite; }}\n")
+    f.write("@keyframes efeitos {\n" + "\n".join(passos) + "\n}\n</style></head><body>\n")
+    f.write("<div class='ecra'><pre class='fita'>")
+    for _, frame in frames:
+        linhas = frame.split('\n')
+        linhas += [''] * (altura - len(linhas)) # Todos os frames ocupam a mesma altura
+        f.write(html.escape('\n'.join(linhas)) + '\n')
+    f.write("</pre></div>\n</body></html>\n")
+
+# Grava os frames no ficheiro, no formato pedido (cast, ansi ou html), sem esperas reais.
+# O formato 'ansi' é o stream de sequências ANSI tal como seria escrito no terminal.
+# Devolve False, sem criar o ficheiro, se não houver nenhum frame para gravar.
+def gravar(frames, ficheiro: str, formato: str, titulo: str, diferencial: bool = False, idle_max: float | None = None) -> bool:
+    frames = compactar_frames(frames, idle_max)
+    if not frames:
+        return False
+    largura = max((len(linha) for _, frame in frames for linha in frame.split('\n')), default=1) or 1
+    altura = max(frame.count('\n') + 1 for _, frame in frames)
+
+    with open(ficheiro, 'w', encoding='utf-8') as f:
+        if formato == 'cast':
+            escrever_cast(frames, f, largura, altura, titulo, diferencial, idle_max)
+        elif formato == 'html':
+            escrever_html(frames, f, largura, altura, titulo)
+        else:
+            for _, dados in eventos_ansi(frames, diferencial):
+                f.write(dados)
+    return True
 
 def todos(): # Corre todos os efeitos com pause e limpeza de tela entre efeitos
-    efeitos = [efeito_1, efeito_2, efeito_3, efeito_4, efeito_5, lambda f: efeito_6(f, args.intervalo)] # Lista de efeitos a serem executados
+    efeitos = [lambda f, c=c: exibir_efeito(c, f) for c in '12345'] # Lista de efeitos a serem executados
+    efeitos.append(lambda f: deslizar(f, args.intervalo, args.diff))
 
     for efeito in efeitos:
         efeito(frase)  # Chama cada efeito com a frase
@@ -168,12 +614,103 @@ if __name__ == '__main__':
     # Configuração de argparse para defenir e ler os argumentos na chamada do script
     parser = argparse.ArgumentParser(
         description="Script de efeitos de texto.",
-        epilog="Exemplo: ./efeitos.py -i 0.1 hello world"
+        epilog="Exemplos: ./efeitos.py -i 0.1 hello world; ./efeitos.py --batch frases.txt --effect 3,5"
     )
-    # Argumento -i opcional, corresponde ao intervalo de segundos para o efeito_6(deslizante)
+    # Argumento -i opcional, corresponde ao intervalo de segundos para o efeito 6 (deslizante)
     parser.add_argument("-i", "--intervalo", required=False, type=float, default=0.5, help='Opcional, Intervalo em segundos. Default 0.5')
+    # Argumento --diff opcional, o efeito 6 redesenha apenas as células que mudam entre frames
+    parser.add_argument("--diff", action='store_true', help='Opcional, no efeito deslizante redesenha apenas as células alteradas')
+    # Argumento --batch opcional, lê as frases de um ficheiro (ou do stdin) e escreve os efeitos sem menu
+    parser.add_argument("--batch", nargs='?', const='-', metavar='FICHEIRO', help='Opcional, modo não interativo: aplica os efeitos a cada linha do ficheiro (ou do stdin, com - ou sem ficheiro)')
+    # Argumento --effect opcional, efeitos aplicados no modo batch
+    parser.add_argument("--effect", type=lista_efeitos, default=tuple(EFEITOS), metavar='LISTA', help='Opcional, efeitos do modo batch separados por vírgulas (ex.: 3,5). Default todos')
+    # Argumento --workers opcional, número de processos do modo batch
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, metavar='N', help='Opcional, número de processos usados no modo batch. Default número de CPUs')
+    # Argumento --lane opcional e repetível, cada faixa do compositor de várias frases deslizantes
+    parser.add_argument("--lane", action='append', nargs='+', metavar=('TEXTO', 'VELOCIDADE DIRECAO LARGURA'),
+                        help='Opcional e repetível, faixa do compositor: texto, velocidade em colunas por segundo '
+                             '(default 1/intervalo), direção (direita ou esquerda) e largura (default 40)')
+    # Argumento --frames opcional, termina o compositor ao fim de N frames
+    parser.add_argument("--frames", type=int, metavar='N', help='Opcional, número de frames do compositor (até Ctrl-C) ou do efeito 6 gravado (um ciclo)')
+    # Argumento --record opcional, grava a animação num ficheiro sem a exibir
+    parser.add_argument("--record", metavar='FICHEIRO', help='Opcional, grava os efeitos do --effect (ou as faixas do --lane) no ficheiro, sem esperas')
+    # Argumento --format opcional, formato da gravação
+    parser.add_argument("--format", choices=sorted(set(FORMATOS_GRAVACAO.values())), help='Opcional, formato do --record. Default pela extensão do ficheiro')
+    # Argumento --idle-max opcional, duração máxima de cada frame na gravação
+    parser.add_argument("--idle-max", type=float, default=2.0, metavar='SEGUNDOS', help='Opcional, duração máxima de cada frame na gravação. Default 2.0')
     # Argumentos extras
-    parser.add_argument('strings', nargs='+', help='Texto a ser exibido')
+    parser.add_argument('strings', nargs='*', help='Texto a ser exibido')
     args = parser.parse_args()
+    if args.intervalo <= 0:
+        parser.error("o intervalo tem de ser maior que 0")
+    if args.workers < 1:
+        parser.error("o número de workers tem de ser maior que 0")
+    if args.frames is not None and args.frames < 1:
+        parser.error("o número de frames tem de ser maior que 0")
+    if args.idle_max <= 0:
+        parser.error("o --idle-max tem de ser maior que 0")
+
+    # As faixas do --lane servem tanto ao compositor como ao --record
+    faixas = None
+    if args.lane:
+        if args.strings or args.batch is not None:
+            parser.error("--lane não pode ser usado com --batch nem com frases nos argumentos")
+        try:
+            faixas = [criar_faixa(valores, 1 / args.intervalo) for valores in args.lane]
+        except ValueError as erro:
+            parser.error(f"--lane: {erro}")
+
+    if args.record is not None:
+        formato = args.format or FORMATOS_GRAVACAO.get(os.path.splitext(args.record)[1].lower())
+        if formato is None:
+            parser.error(f"formato desconhecido para {args.record}, indique-o com --format")
+        if args.batch is not None:
+            parser.error("--record não pode ser usado com --batch")
+        if faixas:
+            frames = frames_faixas(faixas, intervalo_compositor(faixas, args.intervalo), args.frames)
+            titulo = ' | '.join(faixa.texto for faixa in faixas)
+        else:
+            if not args.strings:
+                parser.error("indique o texto a gravar (ou use --lane)")
+            titulo = " ".join(args.strings).upper()
+            if not titulo:
+                parser.error("o texto a gravar não pode ser vazio")
+            frames = chain.from_iterable(frames_efeito(codigo, titulo, args.intervalo, args.frames) for codigo in args.effect)
+        try:
+            gravado = gravar(frames, args.record, formato, titulo, args.diff, args.idle_max)
+        except OSError as erro:
+            parser.error(f"não foi possível gravar {args.record}: {erro.strerror}")
+        if not gravado:
+            parser.error("os efeitos escolhidos não produziram nenhum frame para gravar")
+        sys.exit()
+
+    if faixas:
+        try:
+            agendador = asyncio.run(compor_faixas(faixas, intervalo_compositor(faixas, args.intervalo),
+                                                  args.frames, args.diff))
+        except KeyboardInterrupt:
+            sys.exit(130)
+        print(agendador.resumo())
+        sys.exit()
+
+    if args.batch is not None:
+        if args.strings:
+            parser.error("no modo --batch as frases são lidas do ficheiro, não dos argumentos")
+        try:
+            ficheiro = sys.stdin if args.batch == '-' else open(args.batch, encoding='utf-8')
+        except OSError as erro:
+            parser.error(f"não foi possível ler {args.batch}: {erro.strerror}")
+        try:
+            with ficheiro:
+                batch(ficheiro, args.effect, args.workers)
+        except BrokenPipeError:
+            # O output foi enviado para um comando que terminou antes do fim (ex.: ... | head).
+            # Redireciona o stdout para /dev/null para o Python não falhar ao fechá-lo.
+            os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+            sys.exit(1)
+        sys.exit()
+
+    if not args.strings:
+        parser.error("indique o texto a exibir (ou use --batch ou --lane)")
     frase = " ".join(args.strings).upper() # Transforma os argumentos numa string
     main(frase, args.intervalo) # É chamada a função main com os valores dos argumentos
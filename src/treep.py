@@ -14,9 +14,27 @@ Descrição:
 import os
 import sys
 import argparse
-import io
+import ctypes
+import ctypes.util
+import errno
+import fnmatch
+import hashlib
+import html
+import json
+import pickle
 import re
-from contextlib import redirect_stdout
+import select
+import struct
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+try:
+    import resource # Pico de memória no --stats (não existe em Windows)
+except ImportError:
+    resource = None
 
 # Códigos ANSI para diferenciar melhor as diretorias dos ficheiros com cores diferentes
 class Color:
@@ -26,88 +44,706 @@ class Color:
     END = '\033[0m'
     RED = '\x1b[31m'
 
-# Contadores globais, track de quantas diretorias e ficheiros foram percorridos.
-total_ficheiros = 0
-total_diretorias = 0
+# Paleta sem cores, usada quando o stdout não é um terminal ou com --no-color
+class NoColor:
+    GREEN = ''
+    BOLD = ''
+    CYAN = ''
+    END = ''
+    RED = ''
+
+# Número de diretorias lidas sequencialmente antes de arrancar a pool de threads do --jobs.
+# Em árvores pequenas a pool nunca chega a ser criada e o custo de arranque é evitado.
+LIMIAR_PARALELO = 64
+
+# Tamanho do buffer de escrita do ficheiro HTML (1 MiB)
+BUFFER_HTML = 1 << 20
+
+# Número de linhas juntadas em cada escrita para o stdout ou para o ficheiro HTML
+LINHAS_POR_ESCRITA = 4096
+
+# Diretoria da cache persistente das leituras (~/.cache/treep ou $XDG_CACHE_HOME/treep)
+DIRETORIA_CACHE = os.path.join(os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache'), 'treep')
+VERSAO_CACHE = 1
+# Diretorias alteradas há menos de 2s não ficam em cache: uma alteração feita no mesmo
+# instante da leitura podia não mudar o mtime e a listagem guardada ficaria desatualizada.
+MARGEM_CACHE_NS = 2 * 10 ** 9
+
+# Nó do modelo da árvore: uma diretoria com as subdiretorias e os ficheiros encontrados,
+# a profundidade em relação à root e o total de diretorias/ficheiros da sua subárvore.
+# Os __slots__ mantêm cada nó compacto mesmo em árvores com milhões de entradas.
+class NoDiretoria:
+    __slots__ = ('nome', 'caminho', 'depth', 'link', 'erro', 'diretorias', 'ficheiros', 'tamanhos',
+                 'total_diretorias', 'total_ficheiros', 'tamanho')
+
+    def __init__(self, nome: str, caminho: str, depth: int, link: bool = False, tamanho: int = 0):
+        self.nome = nome
+        self.caminho = caminho
+        self.depth = depth
+        self.link = link # Link simbólico para uma diretoria, é exibido mas não é percorrido
+        self.erro = None # errno do erro ao ler a diretoria (ex.: sem permissão)
+        self.diretorias = [] # Lista de NoDiretoria
+        self.ficheiros = [] # Lista de nomes de ficheiros
+        self.tamanhos = None # Com --size/--du, tamanhos dos ficheiros pela mesma ordem
+        self.total_diretorias = 0
+        self.total_ficheiros = 0
+        self.tamanho = tamanho # Com --size/--du, tamanho total da subárvore
+
+# Contadores do varrimento e tempos das fases, mostrados com --stats. Os contadores podem ser
+# atualizados pelas threads do --jobs, por isso são protegidos por um lock.
+class Estatisticas:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.diretorias_abertas = 0
+        self.reutilizadas_cache = 0
+        self.sem_permissao = [] # Caminhos das diretorias sem permissão de leitura
+        self.outros_erros = [] # Caminhos das diretorias que não puderam ser lidas por outros motivos
+        self.tempo_escrita = 0.0
+
+    def diretoria_aberta(self):
+        with self.lock:
+            self.diretorias_abertas += 1
+
+    def listagem_reutilizada(self):
+        with self.lock:
+            self.reutilizadas_cache += 1
+
+    def erro(self, caminho: str, erro: OSError):
+        with self.lock:
+            if isinstance(erro, PermissionError):
+                self.sem_permissao.append(caminho)
+            else:
+                self.outros_erros.append(caminho)
+
+estatisticas = Estatisticas()
 
 def main(diretoria: str):
-    # Exibe em modo árvore todas as diretorias e ficheiros recursivamente
-    mostrar_arvore(diretoria)
-    # Exporta para um ficheiro html
-    exportar_para_html(diretoria) if args.html else None
-
-def mostrar_arvore(diretoria: str):
-    global total_diretorias
-    # Snapshot dos ficheiros presentes na diretoria root
-    rootpath, _, rootfiles = next(os.walk(diretoria))
-    print(f' {Color.BOLD + Color.GREEN}{rootpath}{Color.END}') # Diretoria root onde o script é corrido
-
-    # os.walk() retorna um gerador que percorre de forma recursiva todas as pastas e ficheiros a partir da diretoria fornecida.
-    for dirpath, dirnames, filenames in os.walk(diretoria):
-        # Conta a quantidade de separadores '/' para defenir a profundidade da diretoria atual em relação à root
-        depth = dirpath[len(diretoria):].count(os.sep)
-
-        # Verifica se a diretoria corrente é a root, para pordermos exibir os ficheiros da pasta root em último lugar
-        is_root = rootpath == dirpath
-
-        # Se o -L introduzido for 0 mostra apenas as diretorias da root e quebra o ciclo for
-        if args.level == 0:
-            for e in dirnames:
-                indent = '│   ' * depth 
-                line = f"{indent}├── {Color.BOLD + Color.GREEN}{e}{Color.END}" 
-                if args.f:
-                    line += f"{Color.CYAN} {dirpath}{Color.END}"
-                total_diretorias += 1
-                print(line)
+    inicio = time.perf_counter()
+    medir = 'du' if args.du else 'size' if args.size else None
+    # A cache persistente evita voltar a ler as diretorias que não mudaram desde a última execução.
+    # Não é usada com --size/--du: os tamanhos dos ficheiros mudam sem alterar o mtime da diretoria.
+    cache = None if args.no_cache or medir else CacheVarrimento(diretoria, reconstruir=args.rebuild_cache)
+    filtro = criar_filtro(diretoria)
+    # Com --json/--ndjson as entradas são escritas à medida que são percorridas
+    saida_json = SaidaNDJSON(sys.stdout, medir) if args.ndjson else SaidaJSON(sys.stdout, medir) if args.json else None
+    # Percorre a diretoria uma única vez e constrói o modelo da árvore
+    arvore = varrer_arvore(diretoria, args.level, args.d, args.jobs, cache, filtro, medir, saida_json)
+    if cache is not None:
+        cache.guardar(args.cache_max * 1024 ** 2)
+    fim_varrimento = time.perf_counter()
+
+    if saida_json is not None:
+        sys.stdout.flush()
+    elif args.watch:
+        # Com --watch a árvore fica em memória e é atualizada à medida que as diretorias mudam
+        vigiar_arvore(arvore, args.level, filtro, medir, Color if usar_cores() else NoColor)
+    else:
+        # Exibe em modo árvore todas as diretorias e ficheiros recursivamente
+        mostrar_arvore(arvore, Color if usar_cores() else NoColor)
+        # Exporta para um ficheiro html
+        exportar_para_html(diretoria, arvore) if args.html else None
+
+    if args.stats:
+        mostrar_estatisticas(arvore, fim_varrimento - inicio, time.perf_counter() - fim_varrimento, args.stats)
+    return arvore
+
+# Lê o conteúdo de uma diretoria com os.scandir() e devolve as subdiretorias, como pares
+# (nome, é link simbólico), e os nomes dos ficheiros. O tipo de cada entrada vem do próprio
+# scandir, evitando um stat() por entrada. Com medir ('size' ou 'du') devolve também um
+# dicionário nome -> tamanho, lido do stat() da própria entrada durante a listagem.
+def listar_diretoria(caminho: str, medir: str | None = None) -> tuple[list[tuple[str, bool]], list[str], dict | None]:
+    diretorias = []
+    ficheiros = []
+    tamanhos = {} if medir else None
+    with os.scandir(caminho) as entradas:
+        estatisticas.diretoria_aberta()
+        for entrada in entradas:
+            try:
+                is_dir = entrada.is_dir()
+            except OSError:
+                is_dir = False
+            if is_dir:
+                diretorias.append((entrada.name, entrada.is_symlink()))
+                # O espaço ocupado pela própria diretoria só conta para o --du, tal como no du
+                if medir == 'du':
+                    tamanhos[entrada.name] = tamanho_entrada(entrada, medir)
+            else:
+                ficheiros.append(entrada.name)
+                if medir:
+                    tamanhos[entrada.name] = tamanho_entrada(entrada, medir)
+    return diretorias, ficheiros, tamanhos
+
+# Tamanho aparente (--size) ou espaço ocupado em disco (--du) de uma entrada, sem seguir links
+def tamanho_entrada(entrada: os.DirEntry, medir: str) -> int:
+    try:
+        st = entrada.stat(follow_symlinks=False)
+    except OSError:
+        return 0
+    return st.st_blocks * 512 if medir == 'du' else st.st_size
+
+# Soma o tamanho de tudo o que está abaixo de uma diretoria sem criar nós. Usado pelo --size e
+# pelo --du para as diretorias abaixo do nível -L, que são exibidas mas não são percorridas.
+def somar_subarvore(caminho: str, medir: str, filtro: 'Filtro | None' = None) -> int:
+    total = 0
+    pilha = [caminho]
+    while pilha:
+        atual = pilha.pop()
+        try:
+            diretorias, ficheiros, tamanhos = listar_diretoria(atual, medir)
+        except OSError as e:
+            estatisticas.erro(atual, e)
+            continue
+        if filtro is not None:
+            diretorias, ficheiros = filtro.filtrar(atual, diretorias, ficheiros)
+        total += sum(tamanhos[f] for f in ficheiros)
+        for nome, link in diretorias:
+            total += tamanhos.get(nome, 0)
+            if not link:
+                pilha.append(os.path.join(atual, nome))
+    return total
+
+# Preenche o nó com as subdiretorias e ficheiros da diretoria, lidos do disco ou da cache.
+# O filtro é aplicado aqui, antes de os nós serem criados: as diretorias excluídas nunca
+# chegam à pilha e por isso nunca são abertas.
+def ler_diretoria(no: NoDiretoria, apenas_diretorias: bool, cache: 'CacheVarrimento | None' = None,
+                  filtro: 'Filtro | None' = None, medir: str | None = None):
+    tamanhos = None
+    no.erro = None
+    try:
+        if cache is not None:
+            diretorias, ficheiros = cache.listar(no.caminho)
+        else:
+            diretorias, ficheiros, tamanhos = listar_diretoria(no.caminho, medir)
+    except OSError as e:
+        # As diretorias que não podem ser lidas ficam vazias, assinaladas na árvore e contadas no --stats
+        no.erro = e.errno
+        estatisticas.erro(no.caminho, e)
+        return
+
+    if filtro is not None:
+        diretorias, ficheiros = filtro.filtrar(no.caminho, diretorias, ficheiros)
+
+    depth = no.depth + 1
+    if tamanhos is None:
+        no.diretorias = [NoDiretoria(nome, os.path.join(no.caminho, nome), depth, link) for nome, link in diretorias]
+        if not apenas_diretorias:
+            no.ficheiros = ficheiros
+        return
+
+    no.diretorias = [NoDiretoria(nome, os.path.join(no.caminho, nome), depth, link, tamanhos.get(nome, 0))
+                     for nome, link in diretorias]
+    # Com -d os ficheiros não ficam no modelo, mas o seu tamanho conta para o total da diretoria
+    tamanhos_ficheiros = [tamanhos[f] for f in ficheiros]
+    no.tamanho += sum(tamanhos_ficheiros)
+    if not apenas_diretorias:
+        no.ficheiros = ficheiros
+        no.tamanhos = tamanhos_ficheiros
+
+# Cache persistente das listagens de diretorias, guardada num ficheiro por diretoria root.
+# Cada listagem fica associada ao mtime da diretoria: nas execuções seguintes basta um stat()
+# para saber se a listagem guardada ainda é válida, e só as diretorias alteradas são lidas.
+class CacheVarrimento:
+    def __init__(self, diretoria: str, reconstruir: bool = False):
+        nome = hashlib.sha1(diretoria.encode('utf-8', 'surrogateescape')).hexdigest()
+        self.ficheiro = os.path.join(DIRETORIA_CACHE, f'{nome}.pickle')
+        self.diretoria = diretoria
+        self.antigas = {} if reconstruir else self._carregar()
+        self.visitadas = {} # Listagens usadas nesta execução: caminho -> (mtime, diretorias, ficheiros)
+        self.alterada = reconstruir
+
+    def _carregar(self) -> dict:
+        try:
+            with open(self.ficheiro, 'rb') as f:
+                dados = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ValueError):
+            return {}
+        # Ficheiros de outra versão ou de outra diretoria (colisão de hash) são ignorados
+        if not isinstance(dados, dict) or dados.get('versao') != VERSAO_CACHE or dados.get('raiz') != self.diretoria:
+            return {}
+        return dados['diretorias']
+
+    def listar(self, caminho: str) -> tuple[list[tuple[str, bool]], list[str]]:
+        mtime = os.stat(caminho).st_mtime_ns
+        guardada = self.antigas.get(caminho)
+        if guardada is not None and guardada[0] == mtime:
+            self.visitadas[caminho] = guardada
+            estatisticas.listagem_reutilizada()
+            return guardada[1], guardada[2]
+
+        diretorias, ficheiros, _ = listar_diretoria(caminho)
+        if time.time_ns() - mtime > MARGEM_CACHE_NS:
+            self.visitadas[caminho] = (mtime, diretorias, ficheiros)
+            self.alterada = True
+        return diretorias, ficheiros
+
+    # Junta as listagens desta execução com as antigas que não foram visitadas (por exemplo,
+    # abaixo do -L atual). As antigas só se mantêm enquanto a diretoria pai ainda as listar,
+    # para que as diretorias apagadas não se acumulem na cache.
+    def _juntar(self) -> dict:
+        diretorias = dict(self.visitadas)
+        removidas = set()
+        # Nomes das subdiretorias (sem links) de cada diretoria visitada, para consultas em tempo constante
+        subdiretorias = {pai: {nome for nome, link in listagem[1] if not link} for pai, listagem in self.visitadas.items()}
+        for caminho in sorted(self.antigas.keys() - self.visitadas.keys(), key=lambda c: c.count(os.sep)):
+            pai, nome = os.path.split(caminho)
+            if pai in removidas or (pai in subdiretorias and nome not in subdiretorias[pai]):
+                removidas.add(caminho)
+            else:
+                diretorias[caminho] = self.antigas[caminho]
+        return diretorias
+
+    # Grava a cache, só se alguma listagem mudou, e limita o tamanho total da diretoria da cache.
+    # Erros de escrita (disco cheio, home só de leitura) não impedem a execução do script.
+    def guardar(self, limite_bytes: int):
+        try:
+            if self.alterada:
+                os.makedirs(DIRETORIA_CACHE, exist_ok=True)
+                dados = {'versao': VERSAO_CACHE, 'raiz': self.diretoria, 'diretorias': self._juntar()}
+                # Escreve num ficheiro temporário e substitui o antigo, para nunca deixar uma cache a meio
+                with tempfile.NamedTemporaryFile('wb', dir=DIRETORIA_CACHE, suffix='.tmp', delete=False) as f:
+                    pickle.dump(dados, f, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(f.name, self.ficheiro)
+            elif os.path.exists(self.ficheiro):
+                # Marca a cache como usada recentemente para a limpeza por tamanho
+                os.utime(self.ficheiro)
+            else:
+                return
+            limitar_cache(limite_bytes)
+        except OSError:
+            pass
+
+# Apaga as caches usadas há mais tempo até o total ficar dentro do limite (--cache-max).
+def limitar_cache(limite_bytes: int):
+    caches = []
+    with os.scandir(DIRETORIA_CACHE) as entradas:
+        for entrada in entradas:
+            if entrada.name.endswith('.pickle'):
+                st = entrada.stat()
+                caches.append((st.st_mtime, st.st_size, entrada.path))
+
+    total = sum(tamanho for _, tamanho, _ in caches)
+    for _, tamanho, caminho in sorted(caches):
+        if total <= limite_bytes:
             break
+        os.remove(caminho)
+        total -= tamanho
 
-        # Exibe as pastas dentro da diretoria a ser avaliada
-        exibir_diretoria(depth=depth-1,
-                        dirpath=dirpath,
-                        sub_dir=os.path.basename(dirpath))
-        
-        # Se o nível de recursividade for maior que o args.level a lista diretorias fica vazia impedindo
-        # o os.walk() de continuar a descer de níveis.
-        if depth > args.level:
-            dirnames[:] = [] 
-            continue # Passa para a próxima iteração
-        
-        # Se o argumento -d for falso e a diretoria não for a root, exibe os ficheios da diretoria atual
-        if not args.d and not is_root:
-            exibir_ficheiros(ficheiros=filenames, depth=depth, dirpath=dirpath)
-
-    # Exibe os ficheiros da diretoria root
-    if not args.d:
-        exibir_ficheiros(ficheiros=rootfiles,depth=0, dirpath=dirpath)
-    print()
-    # Mostrar número de diretorias e ficheiros percorridos.
-    print(f"{total_diretorias} diretorias, {total_ficheiros} ficheiros")
-
-# Todos os prints estão formatados com a indentação proporcional ao nível de profundidade
-def exibir_ficheiros(ficheiros : list[str], depth : int, dirpath : str):
-    global total_ficheiros
-    for f in ficheiros:
-        total_ficheiros += 1
-        file_indent = '│   ' * (depth) # Indentação da linha
-        # Junta o caminho actual com o nome do ficheiro para obter o caminho do ficheiro
-        file_path = os.path.join(dirpath, f)
-        # Verifica se é o ultimo ficheiro
-        line = f"{file_indent}└── {f}" if f == ficheiros[-1] else f"{file_indent}├── {f}"
-        if args.f:
-            # Adiciona o path do ficheiro
-            line += f"{Color.CYAN} {file_path}{Color.END}"
-        print(line)
-
-# As diretorias têm o texto a verde e bold e todos os paths/caminhos a ciano 
-def exibir_diretoria(depth : int, dirpath : str, sub_dir : str):
-    global total_diretorias
-    if dirpath != args.diretoria:
-        indent = '│   ' * depth 
-        line = f"{indent}├── {Color.BOLD + Color.GREEN}{sub_dir}{Color.END}" 
+# Filtros de inclusão/exclusão aplicados durante o varrimento (--exclude, --include,
+# --exclude-regex, --include-regex e --gitignore). Os padrões são compilados uma única vez:
+# os globs comparam o nome da entrada e as regex procuram no caminho relativo à root.
+# As exclusões aplicam-se a diretorias e ficheiros; as inclusões só aos ficheiros, para que
+# as diretorias continuem a ser percorridas à procura de ficheiros que correspondam.
+class Filtro:
+    def __init__(self, raiz: str, exclude: list[str] = (), include: list[str] = (),
+                 exclude_regex: list[str] = (), include_regex: list[str] = (), gitignore: bool = False):
+        self.raiz = raiz
+        self.exclude = compilar_globs(exclude)
+        self.include = compilar_globs(include)
+        self.exclude_regex = compilar_regex(exclude_regex)
+        self.include_regex = compilar_regex(include_regex)
+        self.gitignore = gitignore
+        self.regras = {} # Regras .gitignore em vigor em cada diretoria lida
+
+    def filtrar(self, caminho: str, diretorias: list[tuple[str, bool]],
+                ficheiros: list[str]) -> tuple[list[tuple[str, bool]], list[str]]:
+        rel = caminho[len(self.raiz) + 1:].replace(os.sep, '/')
+        regras = self.regras_gitignore(caminho, rel, ficheiros) if self.gitignore else ()
+
+        diretorias = [d for d in diretorias if not self.excluida(rel, d[0], True, regras)]
+        ficheiros = [f for f in ficheiros if not self.excluida(rel, f, False, regras) and self.incluida(rel, f)]
+        return diretorias, ficheiros
+
+    def excluida(self, rel: str, nome: str, is_dir: bool, regras: tuple) -> bool:
+        if self.exclude is not None and self.exclude.match(nome):
+            return True
+        if self.exclude_regex is not None and procurar_regex(self.exclude_regex, f"{rel}/{nome}" if rel else nome):
+            return True
+        if self.gitignore:
+            if is_dir and nome == '.git':
+                return True
+            if regras and ignorada_git(regras, f"{rel}/{nome}" if rel else nome, nome, is_dir):
+                return True
+        return False
+
+    def incluida(self, rel: str, nome: str) -> bool:
+        if self.include is None and self.include_regex is None:
+            return True
+        if self.include is not None and self.include.match(nome):
+            return True
+        return self.include_regex is not None and procurar_regex(self.include_regex, f"{rel}/{nome}" if rel else nome)
+
+    # Regras herdadas da diretoria pai, mais as do .gitignore desta diretoria (se existir).
+    # A diretoria pai é sempre lida antes das filhas, mesmo com --jobs.
+    def regras_gitignore(self, caminho: str, rel: str, ficheiros: list[str]) -> tuple:
+        regras = self.regras.get(os.path.dirname(caminho), ()) if caminho != self.raiz else ()
+        if '.gitignore' in ficheiros:
+            regras = regras + ler_gitignore(os.path.join(caminho, '.gitignore'), rel)
+        self.regras[caminho] = regras
+        return regras
+
+# Junta vários globs numa única regex, para um só teste por entrada
+def compilar_globs(padroes: list[str]) -> re.Pattern | None:
+    if not padroes:
+        return None
+    return re.compile('|'.join(f'(?:{fnmatch.translate(p)})' for p in padroes))
+
+# As regex do utilizador são compiladas separadamente: juntas numa só, as flags globais como (?i)
+# deixariam de ser válidas e as referências como \1 passariam a apontar para o grupo de outra regex.
+def compilar_regex(padroes: list[str]) -> tuple[re.Pattern, ...] | None:
+    if not padroes:
+        return None
+    return tuple(re.compile(p) for p in padroes)
+
+# Indica se alguma das regex encontra uma correspondência no texto
+def procurar_regex(regex: tuple[re.Pattern, ...], texto: str) -> bool:
+    return any(r.search(texto) for r in regex)
+
+# Lê um .gitignore e devolve as regras como tuplos (base, regex, negada, só diretorias, ancorada),
+# em que base é o caminho relativo da diretoria onde está o .gitignore.
+def ler_gitignore(caminho: str, base: str) -> tuple:
+    regras = []
+    try:
+        with open(caminho, encoding='utf-8', errors='surrogateescape') as f:
+            linhas = f.read().splitlines()
+    except OSError:
+        return ()
+
+    for linha in linhas:
+        linha = linha.rstrip(' ')
+        if not linha or linha.startswith('#'):
+            continue
+        negada = linha.startswith('!')
+        if negada:
+            linha = linha[1:]
+        so_diretorias = linha.endswith('/')
+        linha = linha.rstrip('/')
+        # Um padrão com '/' no início ou no meio é relativo à diretoria do .gitignore;
+        # sem '/' corresponde ao nome da entrada em qualquer nível abaixo dela.
+        ancorada = '/' in linha
+        linha = linha.lstrip('/')
+        if linha:
+            regras.append((base, traduzir_gitignore(linha), negada, so_diretorias, ancorada))
+    return tuple(regras)
+
+# Converte um padrão do .gitignore numa regex: '*' e '?' não atravessam '/', '**/' corresponde
+# a zero ou mais diretorias e '/**' a tudo o que está dentro de uma diretoria.
+def traduzir_gitignore(padrao: str) -> re.Pattern:
+    i, n = 0, len(padrao)
+    res = []
+    while i < n:
+        c = padrao[i]
+        if padrao.startswith('**/', i):
+            res.append('(?:.*/)?')
+            i += 3
+            continue
+        if padrao.startswith('**', i):
+            res.append('.*')
+            i += 2
+            continue
+        if c == '*':
+            res.append('[^/]*')
+        elif c == '?':
+            res.append('[^/]')
+        elif c == '[' and (j := padrao.find(']', i + 2)) != -1:
+            classe = padrao[i + 1:j].replace('\\', '\\\\')
+            if classe.startswith('!'):
+                classe = '^' + classe[1:]
+            res.append(f'[{classe}]')
+            i = j
+        elif c == '\\' and i + 1 < n:
+            i += 1
+            res.append(re.escape(padrao[i]))
+        else:
+            res.append(re.escape(c))
+        i += 1
+    return re.compile(''.join(res))
+
+# A última regra que corresponder decide, tal como no git: '!' volta a incluir a entrada.
+def ignorada_git(regras: tuple, rel: str, nome: str, is_dir: bool) -> bool:
+    for base, regex, negada, so_diretorias, ancorada in reversed(regras):
+        if so_diretorias and not is_dir:
+            continue
+        alvo = (rel[len(base) + 1:] if base else rel) if ancorada else nome
+        if regex.fullmatch(alvo):
+            return not negada
+    return False
+
+# Cria o filtro a partir dos argumentos, ou None se nenhum filtro foi pedido
+def criar_filtro(diretoria: str) -> Filtro | None:
+    if not (args.exclude or args.include or args.exclude_regex or args.include_regex or args.gitignore):
+        return None
+    return Filtro(diretoria, args.exclude, args.include, args.exclude_regex, args.include_regex, args.gitignore)
+
+# Percorre a árvore a partir da diretoria dada e devolve o nó root com o modelo completo.
+def varrer_arvore(diretoria: str, nivel: int, apenas_diretorias: bool = False, jobs: int = 1,
+                  cache: CacheVarrimento | None = None, filtro: 'Filtro | None' = None,
+                  medir: str | None = None, observador=None) -> NoDiretoria:
+    raiz = NoDiretoria(diretoria, diretoria, 0)
+    if medir == 'du':
+        raiz.tamanho = os.stat(diretoria).st_blocks * 512
+    varrer_subarvore(raiz, nivel, apenas_diretorias, jobs, cache, filtro, medir, observador)
+    return raiz
+
+# Percorre a subárvore de um nó (a root ou, com --watch, uma diretoria nova) uma única vez.
+# As diretorias só são lidas até ao nível pedido (-L): as do nível seguinte são apenas exibidas,
+# por isso nunca chegam a ser abertas (exceto com --size/--du, em que são somadas sem criar nós).
+# Usa uma pilha explícita em vez de recursão para suportar árvores muito profundas; cada nó passa
+# duas vezes pela pilha, à entrada (leitura) e à saída (soma dos totais da subárvore). O observador
+# opcional (--json/--ndjson) é chamado à entrada e à saída de cada nó, por esta ordem.
+#
+# Com jobs > 1, depois das primeiras LIMIAR_PARALELO diretorias, as subdiretorias passam a ser
+# lidas antecipadamente numa pool de threads. A pilha continua a consumir os nós pela mesma ordem,
+# esperando pela leitura de cada um, por isso o modelo é igual ao da versão sequencial.
+def varrer_subarvore(raiz: NoDiretoria, nivel: int, apenas_diretorias: bool = False, jobs: int = 1,
+                     cache: CacheVarrimento | None = None, filtro: 'Filtro | None' = None,
+                     medir: str | None = None, observador=None):
+    nivel = max(nivel, 0)
+    pilha = [(raiz, False)]
+    pendentes = {} # Leituras antecipadas em curso, indexadas pelo caminho da diretoria
+    pool = None
+    lidas = 0
+
+    # As diretorias até ao nível -L são lidas; com --size/--du as do nível seguinte são somadas,
+    # para o tamanho exibido e o total incluírem as suas subárvores.
+    # Os links simbólicos para diretorias nunca são percorridos.
+    def a_processar(no: NoDiretoria) -> bool:
+        return not no.link and (no.depth <= nivel or medir is not None)
+
+    def processar(no: NoDiretoria):
+        if no.depth <= nivel:
+            ler_diretoria(no, apenas_diretorias, cache, filtro, medir)
+        else:
+            no.tamanho += somar_subarvore(no.caminho, medir, filtro)
+
+    def agendar(no: NoDiretoria):
+        for d in no.diretorias:
+            if a_processar(d):
+                pendentes[d.caminho] = pool.submit(processar_antecipadamente, d)
+
+    # Corre numa thread da pool: lê a diretoria e agenda logo as subdiretorias,
+    # antes de o resultado ficar disponível para a pilha.
+    def processar_antecipadamente(no: NoDiretoria):
+        processar(no)
+        agendar(no)
+
+    try:
+        while pilha:
+            no, saida = pilha.pop()
+
+            if saida:
+                somar_totais(no, medir)
+                if observador is not None:
+                    observador.sair(no)
+                continue
+
+            if a_processar(no):
+                futuro = pendentes.pop(no.caminho, None)
+                if futuro is not None:
+                    futuro.result()
+                else:
+                    processar(no)
+                    lidas += 1
+                    if pool is None and jobs > 1 and lidas >= LIMIAR_PARALELO:
+                        pool = ThreadPoolExecutor(max_workers=jobs)
+                    if pool is not None:
+                        agendar(no)
+
+            if observador is not None:
+                observador.entrar(no)
+            pilha.append((no, True))
+            pilha.extend((d, False) for d in reversed(no.diretorias))
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+
+# Totais da subárvore de um nó, a partir dos totais das subdiretorias (já calculados).
+# O tamanho do nó tem, até aqui, apenas o da própria diretoria e dos seus ficheiros.
+def somar_totais(no: NoDiretoria, medir: str | None = None):
+    contar_totais(no)
+    if medir:
+        no.tamanho += sum(d.tamanho for d in no.diretorias)
+
+def contar_totais(no: NoDiretoria):
+    no.total_diretorias = len(no.diretorias) + sum(d.total_diretorias for d in no.diretorias)
+    no.total_ficheiros = len(no.ficheiros) + sum(d.total_ficheiros for d in no.diretorias)
+
+# Escreve a árvore em JSON à medida que é percorrida (--json). Cada diretoria é aberta quando é
+# lida, com os seus ficheiros, e fechada com os totais da subárvore quando todas as subdiretorias
+# foram percorridas. Cada entrada fica numa linha para poder ser consumida antes do fim.
+class SaidaJSON:
+    def __init__(self, destino, medir: str | None = None):
+        self.destino = destino
+        self.medir = medir
+        self.vazias = [] # Para cada diretoria aberta, se ainda não tem nenhuma entrada escrita
+
+    def entrar(self, no: NoDiretoria):
+        partes = []
+        if self.vazias:
+            partes.append('\n' if self.vazias[-1] else ',\n')
+            self.vazias[-1] = False
+        partes.append(f'{{"type": "directory", "name": {json.dumps(no.nome)}, "path": {json.dumps(no.caminho)}, ')
+        if no.link:
+            partes.append('"link": true, ')
+        if no.erro is not None:
+            partes.append(f'"error": {json.dumps(descrever_erro(no.erro))}, ')
+        partes.append('"contents": [')
+        for i, f in enumerate(no.ficheiros):
+            partes.append(',\n' if i else '\n')
+            partes.append(f'{{"type": "file", "name": {json.dumps(f)}')
+            if no.tamanhos is not None:
+                partes.append(f', "size": {no.tamanhos[i]}')
+            partes.append('}')
+        self.vazias.append(not no.ficheiros)
+        self.destino.write(''.join(partes))
+
+    def sair(self, no: NoDiretoria):
+        partes = [']' if self.vazias.pop() else '\n]']
+        partes.append(f', "directories": {no.total_diretorias}, "files": {no.total_ficheiros}')
+        if self.medir:
+            partes.append(f', "size": {no.tamanho}')
+        # A root fecha o documento
+        partes.append('}' if self.vazias else '}\n')
+        self.destino.write(''.join(partes))
+
+# Escreve um objeto JSON por linha (--ndjson): cada diretoria e os seus ficheiros assim que a
+# diretoria é lida. Com --size/--du, cada diretoria tem também um registo "rollup" com os totais
+# da subárvore, escrito quando acaba de ser percorrida, e no fim há sempre um registo "report".
+class SaidaNDJSON:
+    def __init__(self, destino, medir: str | None = None):
+        self.destino = destino
+        self.medir = medir
+
+    def entrar(self, no: NoDiretoria):
+        registo = {'type': 'directory', 'name': no.nome, 'path': no.caminho, 'depth': no.depth}
+        if no.link:
+            registo['link'] = True
+        if no.erro is not None:
+            registo['error'] = descrever_erro(no.erro)
+        linhas = [json.dumps(registo)]
+        for i, f in enumerate(no.ficheiros):
+            registo = {'type': 'file', 'name': f, 'path': os.path.join(no.caminho, f), 'depth': no.depth + 1}
+            if no.tamanhos is not None:
+                registo['size'] = no.tamanhos[i]
+            linhas.append(json.dumps(registo))
+        linhas.append('')
+        self.destino.write('\n'.join(linhas))
+
+    def sair(self, no: NoDiretoria):
+        totais = {'directories': no.total_diretorias, 'files': no.total_ficheiros}
+        if self.medir:
+            totais['size'] = no.tamanho
+            self.destino.write(json.dumps({'type': 'rollup', 'path': no.caminho, **totais}) + '\n')
+        if no.depth == 0:
+            self.destino.write(json.dumps({'type': 'report', **totais}) + '\n')
+
+# Indentações de cada nível calculadas uma única vez: prefixos[depth] = '│   ' * depth + ramo
+class Prefixos(dict):
+    def __init__(self, ramo: str):
+        super().__init__()
+        self.ramo = ramo
+
+    def __missing__(self, depth: int) -> str:
+        prefixo = self[depth] = '│   ' * depth + self.ramo
+        return prefixo
+
+# Gera as linhas da árvore a partir do modelo, uma a uma, pela mesma ordem em que o os.walk()
+# as exibia: cada diretoria, seguida dos seus ficheiros e depois das suas subdiretorias; os
+# ficheiros da root ficam no fim. As diretorias têm o texto a verde e bold e os caminhos a ciano.
+# Com escapar=html.escape as linhas servem para o ficheiro HTML.
+def linhas_arvore(arvore: NoDiretoria, cores=Color, escapar=str):
+    cor_dir = cores.BOLD + cores.GREEN
+    cor_caminho = cores.CYAN
+    fim_cor = cores.END
+    ramos = Prefixos('├── ')
+    fins = Prefixos('└── ')
+    medir = args.size or args.du
+
+    # Com --size/--du, o tamanho aparece entre parênteses retos antes do nome
+    def etiqueta(tamanho: int) -> str:
+        return f"[{formatar_tamanho(tamanho):>6}] " if medir else ""
+
+    # Linhas dos ficheiros de uma diretoria; o último usa '└──'
+    def linhas_ficheiros(no: NoDiretoria):
+        ramo = ramos[no.depth]
+        ultimo = len(no.ficheiros) - 1
+        for i, f in enumerate(no.ficheiros):
+            prefixo = fins[no.depth] if i == ultimo else ramo
+            if medir:
+                prefixo += etiqueta(no.tamanhos[i])
+            if args.f:
+                yield f"{prefixo}{escapar(f)}{cor_caminho} {escapar(os.path.join(no.caminho, f))}{fim_cor}"
+            else:
+                yield f"{prefixo}{escapar(f)}"
+
+    yield f" {cor_dir}{escapar(arvore.caminho)}{fim_cor}" # Diretoria root onde o script é corrido
+
+    pilha = list(reversed(arvore.diretorias))
+    while pilha:
+        no = pilha.pop()
+
+        # A diretoria fica com a indentação do nível anterior
+        prefixo = ramos[no.depth - 1] + etiqueta(no.tamanho) if medir else ramos[no.depth - 1]
         if args.f:
-            line += f"{Color.CYAN} {dirpath}{Color.END}"
-        total_diretorias += 1
-        print(line)
+            linha = f"{prefixo}{cor_dir}{escapar(no.nome)}{fim_cor}{cor_caminho} {escapar(no.caminho)}{fim_cor}"
+        else:
+            linha = f"{prefixo}{cor_dir}{escapar(no.nome)}{fim_cor}"
+        # Diretorias que não puderam ser lidas
+        if no.erro is not None:
+            linha += f" {cores.RED}[{descrever_erro(no.erro)}]{fim_cor}"
+        yield linha
+
+        # As diretorias abaixo do nível -L não foram lidas, por isso não têm ficheiros
+        if not args.d:
+            yield from linhas_ficheiros(no)
+
+        pilha.extend(reversed(no.diretorias))
+
+    # Ficheiros da diretoria root
+    if not args.d:
+        yield from linhas_ficheiros(arvore)
+    yield ""
+    # Número de diretorias e ficheiros percorridos.
+    if medir:
+        yield f"{arvore.total_diretorias} diretorias, {arvore.total_ficheiros} ficheiros, {formatar_tamanho(arvore.tamanho)} no total"
+    else:
+        yield f"{arvore.total_diretorias} diretorias, {arvore.total_ficheiros} ficheiros"
+
+# Tamanho legível: 512B, 4.0K, 12.3M, ...
+def formatar_tamanho(tamanho: int) -> str:
+    valor = float(tamanho)
+    for unidade in 'BKMGT':
+        if valor < 1024:
+            break
+        valor /= 1024
+    else:
+        unidade = 'P'
+    return f"{tamanho}B" if unidade == 'B' else f"{valor:.1f}{unidade}"
+
+# Escreve as linhas em lotes de LINHAS_POR_ESCRITA, com uma única escrita por lote em vez de
+# um print() por linha. Devolve o número de linhas escritas.
+# O tempo passado nas escritas fica no --stats, separado do tempo de render das linhas.
+def escrever_linhas(linhas, destino) -> int:
+    total = 0
+    while lote := list(islice(linhas, LINHAS_POR_ESCRITA)):
+        inicio = time.perf_counter()
+        destino.write('\n'.join(lote))
+        destino.write('\n')
+        estatisticas.tempo_escrita += time.perf_counter() - inicio
+        total += len(lote)
+    return total
+
+def descrever_erro(numero: int | None) -> str:
+    if numero in (errno.EACCES, errno.EPERM):
+        return 'sem permissão'
+    return os.strerror(numero) if numero is not None else 'erro ao ler a diretoria'
+
+def mostrar_arvore(arvore: NoDiretoria, cores=Color):
+    escrever_linhas(linhas_arvore(arvore, cores), sys.stdout)
+    sys.stdout.flush()
+
+# As cores só são usadas num terminal, e nunca com --no-color ou com a variável NO_COLOR definida
+def usar_cores() -> bool:
+    return not args.no_color and 'NO_COLOR' not in os.environ and sys.stdout.isatty()
 
 # Validação de input e argumentos
 def validations(args,unknown):
@@ -126,34 +762,343 @@ def validations(args,unknown):
         print(f"Sem permissão para aceder à diretoria {args.diretoria}")
         sys.exit(1)
 
-def remove_ansi_code(html : str):
-    ansi_escape = re.compile(r'\x1B(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])') # Regex para ANSI TAGS
-    return ansi_escape.sub('', html)
+    # As expressões regulares dos filtros têm de ser válidas
+    for padrao in args.exclude_regex + args.include_regex:
+        try:
+            re.compile(padrao)
+        except re.error as e:
+            print(f"Expressão regular inválida '{padrao}': {e}")
+            sys.exit(1)
+
+    if args.cache_max < 0:
+        print(f"O tamanho máximo da cache não pode ser negativo: {args.cache_max}")
+        sys.exit(1)
+
+    # O output JSON ocupa o stdout, por isso não pode ser misturado com a mensagem do -H
+    if (args.json or args.ndjson) and args.html:
+        print("As opções --json/--ndjson não podem ser usadas com -H")
+        sys.exit(1)
+
+    # O --watch desenha a árvore no terminal e não mantém os totais do --du abaixo do -L
+    if args.watch and (args.json or args.ndjson or args.html or args.du):
+        print("A opção --watch não pode ser usada com --json, --ndjson, -H ou --du")
+        sys.exit(1)
+
+    if args.watch_interval <= 0:
+        print(f"O intervalo do --watch tem de ser maior que 0: {args.watch_interval}")
+        sys.exit(1)
+
+    # O número de threads tem de ser positivo
+    if args.jobs < 1:
+        print(f"O número de jobs tem de ser maior que 0: {args.jobs}")
+        sys.exit(1)
+
+# Pico de memória do processo em bytes, ou None onde o módulo resource não existe
+def pico_memoria() -> int | None:
+    if resource is None:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # O ru_maxrss vem em bytes no macOS e em KiB no Linux
+    return pico if sys.platform == 'darwin' else pico * 1024
 
+# Mostra no stderr (para não misturar com a árvore) o tempo de cada fase e os contadores do
+# varrimento, em texto ou numa linha JSON (--stats=json). Com --json/--ndjson o output é escrito
+# durante o varrimento, por isso o tempo de escrita faz parte do tempo do varrimento.
+def mostrar_estatisticas(arvore: NoDiretoria, tempo_varrimento: float, tempo_output: float, formato: str):
+    entradas = arvore.total_diretorias + arvore.total_ficheiros
+    tempo_escrita = min(estatisticas.tempo_escrita, tempo_output)
+    dados = {
+        'scan_seconds': round(tempo_varrimento, 6),
+        'render_seconds': round(tempo_output - tempo_escrita, 6),
+        'write_seconds': round(tempo_escrita, 6),
+        'total_seconds': round(tempo_varrimento + tempo_output, 6),
+        'entries': entradas,
+        'entries_per_second': round(entradas / max(tempo_varrimento, 1e-9)),
+        'directories_opened': estatisticas.diretorias_abertas,
+        'cache_hits': estatisticas.reutilizadas_cache,
+        'permission_errors': len(estatisticas.sem_permissao),
+        'other_errors': len(estatisticas.outros_erros),
+        'permission_denied': sorted(estatisticas.sem_permissao),
+        'peak_memory_bytes': pico_memoria(),
+    }
 
-def exportar_para_html(diretoria: str):
+    if formato == 'json':
+        print(json.dumps(dados), file=sys.stderr)
+        return
+
+    linhas = [
+        "",
+        "Estatísticas:",
+        f"  varrimento          {dados['scan_seconds']:.3f}s ({dados['entries_per_second']} entradas/s)",
+        f"  render              {dados['render_seconds']:.3f}s",
+        f"  escrita             {dados['write_seconds']:.3f}s",
+        f"  total               {dados['total_seconds']:.3f}s",
+        f"  entradas            {entradas}",
+        f"  diretorias abertas  {dados['directories_opened']} (reutilizadas da cache: {dados['cache_hits']})",
+        f"  sem permissão       {dados['permission_errors']}",
+    ]
+    # Só as primeiras diretorias sem permissão são listadas; a lista completa está no --stats=json
+    for caminho in dados['permission_denied'][:10]:
+        linhas.append(f"    {caminho}")
+    if dados['permission_errors'] > 10:
+        linhas.append(f"    ... e mais {dados['permission_errors'] - 10}")
+    linhas.append(f"  outros erros        {dados['other_errors']}")
+    if dados['peak_memory_bytes'] is not None:
+        linhas.append(f"  pico de memória     {dados['peak_memory_bytes'] / 1024 ** 2:.1f} MiB")
+    print('\n'.join(linhas), file=sys.stderr)
+
+# Exporta a árvore para HTML escrevendo diretamente no ficheiro, linha a linha, através de um
+# buffer de escrita. A memória usada não depende do tamanho do output.
+def exportar_para_html(diretoria: str, arvore: NoDiretoria):
     nome_ficheiro = ''.join([diretoria.split('/')[-1], '_export.html'])
-    # Inicializar ficheiro HTML
-    html_file = io.StringIO()
-    # A tag <pre> de html permite manter o formato do texto
-    html_file.write("<html><head><meta charset='utf-8'><title>TREEP.py</title></head><body>")
-    html_file.write(f"<h1>Estrutura de {diretoria}</h1><pre><br>")
+    inicio = time.perf_counter()
 
-    # Redireciona a saída padrão temporariamente para capturar o output da funcção {mostrar_arvore}
-    with redirect_stdout(html_file):
-        mostrar_arvore(diretoria)
+    with open(nome_ficheiro, "w", encoding="utf-8", buffering=BUFFER_HTML) as f:
+        # A tag <pre> de html permite manter o formato do texto
+        f.write("<html><head><meta charset='utf-8'><title>TREEP.py</title></head><body>")
+        f.write(f"<h1>Estrutura de {html.escape(diretoria)}</h1><pre><br>")
+        # As linhas são geradas já escapadas e sem cores, e escritas em lotes
+        linhas = escrever_linhas(linhas_arvore(arvore, NoColor, html.escape), f)
+        f.write("</pre></body></html>")
 
-    html_file.write("</pre></body></html>")
-    
-    # Cria um ficheiro 
-    with open(f'{nome_ficheiro}', "w", encoding="utf-8") as f:
-        # Remove código ANSII e grava o ficheiro
-        f.write(remove_ansi_code(html_file.getvalue()))
+    duracao = time.perf_counter() - inicio
+    caminho_ficheiro = os.path.abspath(nome_ficheiro)
+    print(f"\nEstrutura exportada com sucesso para {caminho_ficheiro}")
 
-    print(f"\nEstrutura exportada com sucesso para {diretoria}/{nome_ficheiro}")
+    # Com --html-stats mostra o débito da exportação
+    if args.html_stats:
+        tamanho = os.path.getsize(caminho_ficheiro)
+        duracao = max(duracao, 1e-9)
+        print(f"{linhas} linhas, {tamanho / 1024:.1f} KiB em {duracao:.3f}s "
+              f"({linhas / duracao:.0f} linhas/s, {tamanho / duracao / 1024 ** 2:.1f} MiB/s)")
 
-if __name__ == "__main__":
-    # Configuração de argparse e argumentos opcionais.
+# Constantes do inotify (linux/inotify.h)
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+EVENTO_INOTIFY = struct.Struct('iIII') # wd, mask, cookie, len
+
+# Vigia as diretorias com o inotify do Linux, através da libc com ctypes. Cada diretoria lida
+# tem um watch; os eventos dizem exatamente quais as diretorias alteradas, sem percorrer nada.
+# Se o limite de watches (fs.inotify.max_user_watches) for atingido, as restantes diretorias
+# passam a ser vigiadas por polling.
+class VigiaInotify:
+    nome = 'inotify'
+
+    def __init__(self, medir: str | None = None):
+        self.libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self.libc.inotify_init1.argtypes = [ctypes.c_int]
+        self.libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self.libc.inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+        self.fd = self.libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), os.strerror(ctypes.get_errno()))
+        self.mascara = IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR
+        # Com --size, as alterações ao conteúdo dos ficheiros também mudam o output
+        if medir:
+            self.mascara |= IN_MODIFY | IN_CLOSE_WRITE
+        self.caminhos = {} # wd -> caminho
+        self.watches = {} # caminho -> wd
+        self.sem_watch = VigiaPolling() # Diretorias que ficaram de fora do limite de watches
+
+    def adicionar(self, caminho: str):
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(caminho), self.mascara)
+        if wd < 0:
+            erro = ctypes.get_errno()
+            # Sem permissão, ou a diretoria já não existe: não há nada para vigiar
+            if erro not in (errno.ENOENT, errno.EACCES, errno.ENOTDIR):
+                self.sem_watch.adicionar(caminho)
+            return
+        self.caminhos[wd] = caminho
+        self.watches[caminho] = wd
+
+    def remover(self, caminho: str):
+        wd = self.watches.pop(caminho, None)
+        if wd is not None:
+            self.caminhos.pop(wd, None)
+            self.libc.inotify_rm_watch(self.fd, wd)
+        self.sem_watch.remover(caminho)
+
+    # Espera por eventos durante 'timeout' segundos e devolve o conjunto das diretorias alteradas,
+    # ou None se a fila do kernel transbordou e é preciso voltar a percorrer tudo.
+    def esperar(self, timeout: float) -> set[str] | None:
+        if not select.select([self.fd], [], [], timeout)[0]:
+            return self.sem_watch.verificar()
+        # Dá tempo a que uma rajada de alterações (ex.: um git checkout) chegue toda de uma vez
+        time.sleep(0.05)
+
+        alteradas = self.sem_watch.verificar()
+        while True:
+            try:
+                dados = os.read(self.fd, 1 << 16)
+            except BlockingIOError:
+                break
+            i = 0
+            while i < len(dados):
+                wd, mascara, _, tamanho = EVENTO_INOTIFY.unpack_from(dados, i)
+                i += EVENTO_INOTIFY.size + tamanho
+                if mascara & IN_Q_OVERFLOW:
+                    return None
+                caminho = self.caminhos.get(wd)
+                if caminho is None:
+                    continue
+                if mascara & IN_IGNORED:
+                    self.watches.pop(self.caminhos.pop(wd), None)
+                elif mascara & (IN_DELETE_SELF | IN_MOVE_SELF):
+                    alteradas.add(os.path.dirname(caminho))
+                else:
+                    alteradas.add(caminho)
+        return alteradas
+
+    def fechar(self):
+        os.close(self.fd)
+
+# Alternativa sem inotify: compara periodicamente o mtime de cada diretoria lida. Custa um
+# stat() por diretoria em cada intervalo, em vez de as voltar a ler todas. Não deteta alterações
+# ao conteúdo dos ficheiros, que não mudam o mtime da diretoria.
+class VigiaPolling:
+    nome = 'polling'
+
+    def __init__(self):
+        self.mtimes = {} # caminho -> mtime na última leitura
+
+    def adicionar(self, caminho: str):
+        try:
+            self.mtimes[caminho] = os.stat(caminho).st_mtime_ns
+        except OSError:
+            pass
+
+    def remover(self, caminho: str):
+        self.mtimes.pop(caminho, None)
+
+    def esperar(self, timeout: float) -> set[str]:
+        time.sleep(timeout)
+        return self.verificar()
+
+    def verificar(self) -> set[str]:
+        alteradas = set()
+        for caminho, mtime in list(self.mtimes.items()):
+            try:
+                atual = os.stat(caminho).st_mtime_ns
+            except OSError:
+                # Diretoria apagada: quem muda é a diretoria pai
+                alteradas.add(os.path.dirname(caminho))
+                continue
+            if atual != mtime:
+                self.mtimes[caminho] = atual
+                alteradas.add(caminho)
+        return alteradas
+
+    def fechar(self):
+        pass
+
+# Usa o inotify quando está disponível (Linux), senão o polling dos mtimes
+def criar_vigia(medir: str | None, polling: bool = False):
+    if not polling and sys.platform.startswith('linux'):
+        try:
+            return VigiaInotify(medir)
+        except (OSError, AttributeError):
+            pass
+    return VigiaPolling()
+
+# Mantém a árvore em memória e volta a ler apenas as diretorias que mudaram (--watch).
+# O custo de cada atualização depende do número de diretorias alteradas e não do tamanho
+# da árvore; só o desenho do output é feito de novo a partir do modelo completo.
+def vigiar_arvore(arvore: NoDiretoria, nivel: int, filtro: 'Filtro | None', medir: str | None, cores=Color):
+    nivel = max(nivel, 0)
+    indice = {} # caminho -> nó, para as diretorias lidas (e vigiadas)
+    vigia = criar_vigia(medir, args.poll)
+
+    # Regista (ou retira) as diretorias lidas de uma subárvore no índice e na vigia
+    def registar(no: NoDiretoria):
+        pilha = [no]
+        while pilha:
+            atual = pilha.pop()
+            if atual.link or atual.depth > nivel:
+                continue
+            indice[atual.caminho] = atual
+            vigia.adicionar(atual.caminho)
+            pilha.extend(atual.diretorias)
+
+    def retirar(no: NoDiretoria):
+        pilha = [no]
+        while pilha:
+            atual = pilha.pop()
+            if indice.pop(atual.caminho, None) is not None:
+                vigia.remover(atual.caminho)
+            pilha.extend(atual.diretorias)
+
+    # Volta a ler uma diretoria, mantendo as subárvores das subdiretorias que continuam a existir
+    # e percorrendo só as novas. Os totais são depois corrigidos nas diretorias acima.
+    def atualizar(no: NoDiretoria):
+        tamanho_anterior = no.tamanho
+        anteriores = {d.nome: d for d in no.diretorias}
+        no.diretorias, no.ficheiros, no.tamanhos, no.tamanho = [], [], None, 0
+        ler_diretoria(no, args.d, None, filtro, medir)
+
+        for i, d in enumerate(no.diretorias):
+            anterior = anteriores.pop(d.nome, None)
+            if anterior is not None and anterior.link == d.link:
+                no.diretorias[i] = anterior
+            else:
+                varrer_subarvore(d, nivel, args.d, filtro=filtro, medir=medir)
+                registar(d)
+        for removida in anteriores.values():
+            retirar(removida)
+        somar_totais(no, medir)
+
+        diferenca = no.tamanho - tamanho_anterior
+        pai = indice.get(os.path.dirname(no.caminho)) if no is not arvore else None
+        while pai is not None:
+            contar_totais(pai)
+            pai.tamanho += diferenca
+            pai = indice.get(os.path.dirname(pai.caminho)) if pai is not arvore else None
+
+    def desenhar(alteradas: int):
+        # Num terminal, o cursor volta ao início e o ecrã é limpo antes de desenhar
+        if sys.stdout.isatty():
+            sys.stdout.write('\033[H\033[2J')
+        escrever_linhas(linhas_arvore(arvore, cores), sys.stdout)
+        sys.stdout.write(f"\nA vigiar {len(indice)} diretorias ({vigia.nome}), {alteradas} alteradas às "
+                         f"{time.strftime('%H:%M:%S')}. Ctrl-C para terminar.\n")
+        sys.stdout.flush()
+
+    registar(arvore)
+    desenhar(0)
+    try:
+        while True:
+            alteradas = vigia.esperar(args.watch_interval)
+            if alteradas is None:
+                # A fila de eventos transbordou: volta a ler a árvore toda
+                retirar(arvore)
+                alteradas = {arvore.caminho}
+                arvore.diretorias = []
+                registar(arvore)
+            if not alteradas:
+                continue
+            # As diretorias pai são atualizadas primeiro; as filhas que entretanto desapareceram
+            # já não estão no índice e são ignoradas.
+            for caminho in sorted(alteradas, key=lambda c: c.count(os.sep)):
+                no = indice.get(caminho)
+                if no is not None:
+                    atualizar(no)
+            desenhar(len(alteradas))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        vigia.fechar()
+
+# Configuração de argparse e argumentos opcionais. Fica numa função para que o parser possa
+# ser usado fora do script (ex.: benchmarks/bench_treep.py).
+def criar_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(
         description="Este script exibe o conteúdo de uma directoria em formato de árvore",
         epilog="Exemplo: ./treep.py ~/Desktop/"
@@ -189,6 +1134,139 @@ if __name__ == "__main__":
         action='store_true'
     )
 
+    parser.add_argument(
+        '--html-stats',
+        help='Com -H, mostra o débito da exportação para HTML',
+        action='store_true'
+    )
+
+    parser.add_argument(
+        '-s', '--size',
+        help='Exibir o tamanho dos ficheiros e o total de cada diretoria',
+        action='store_true'
+    )
+
+    parser.add_argument(
+        '--du',
+        help='Como --size, mas com o espaço ocupado em disco e totais que incluem as diretorias abaixo do -L',
+        action='store_true'
+    )
+
+    formato = parser.add_mutually_exclusive_group()
+    formato.add_argument(
+        '--json',
+        help='Escrever a árvore em JSON à medida que é percorrida',
+        action='store_true'
+    )
+    formato.add_argument(
+        '--ndjson',
+        help='Escrever um objeto JSON por linha (diretorias e ficheiros) à medida que são encontrados',
+        action='store_true'
+    )
+
+    parser.add_argument(
+        '--stats',
+        help='Mostrar no stderr o tempo de cada fase, entradas/s, diretorias abertas, erros e pico de memória',
+        nargs='?',
+        const='text',
+        choices=['text', 'json'],
+    )
+
+    parser.add_argument(
+        '--no-color',
+        help='Não usar cores no output (automático quando o output não é um terminal)',
+        action='store_true'
+    )
+
+    parser.add_argument(
+        '-j', '--jobs',
+        help='Número de threads a ler diretorias em paralelo (útil em NFS e discos lentos)',
+        type=int,
+        default=1,
+    )
+
+    parser.add_argument(
+        '--watch',
+        help='Manter a árvore no ecrã e atualizá-la quando as diretorias mudam (inotify ou polling)',
+        action='store_true'
+    )
+
+    parser.add_argument(
+        '--watch-interval',
+        help='Com --watch, intervalo em segundos entre verificações no modo polling (default 1.0)',
+        type=float,
+        default=1.0,
+        metavar='SEGUNDOS',
+    )
+
+    parser.add_argument(
+        '--poll',
+        help='Com --watch, usar polling dos mtimes em vez do inotify',
+        action='store_true'
+    )
+
+    parser.add_argument(
+        '--exclude',
+        help='Excluir entradas cujo nome corresponde ao glob (pode ser repetido)',
+        action='append',
+        default=[],
+        metavar='GLOB',
+    )
+
+    parser.add_argument(
+        '--include',
+        help='Exibir apenas os ficheiros cujo nome corresponde ao glob (pode ser repetido)',
+        action='append',
+        default=[],
+        metavar='GLOB',
+    )
+
+    parser.add_argument(
+        '--exclude-regex',
+        help='Excluir entradas cujo caminho relativo corresponde à regex (pode ser repetido)',
+        action='append',
+        default=[],
+        metavar='REGEX',
+    )
+
+    parser.add_argument(
+        '--include-regex',
+        help='Exibir apenas os ficheiros cujo caminho relativo corresponde à regex (pode ser repetido)',
+        action='append',
+        default=[],
+        metavar='REGEX',
+    )
+
+    parser.add_argument(
+        '--gitignore',
+        help='Excluir a diretoria .git e as entradas ignoradas pelos ficheiros .gitignore',
+        action='store_true'
+    )
+
+    parser.add_argument(
+        '--no-cache',
+        help='Não usar nem atualizar a cache persistente (~/.cache/treep)',
+        action='store_true'
+    )
+
+    parser.add_argument(
+        '--rebuild-cache',
+        help='Ignorar a cache existente e voltar a ler todas as diretorias',
+        action='store_true'
+    )
+
+    parser.add_argument(
+        '--cache-max',
+        help='Tamanho máximo da diretoria da cache em MiB (default 256)',
+        type=int,
+        default=256,
+    )
+
+    return parser
+
+if __name__ == "__main__":
+    parser = criar_parser()
+
     # Atribuição dos argumentos introduzidos.
     args, unknown = parser.parse_known_args()
 
@@ -198,4 +1276,10 @@ if __name__ == "__main__":
     # VALIDAçÕES
     validations(args, unknown)
 
-    main(args.diretoria)
+    try:
+        main(args.diretoria)
+    except BrokenPipeError:
+        # O output foi enviado para um comando que terminou antes do fim (ex.: treep.py . | head).
+        # Redireciona o stdout para /dev/null para o Python não falhar ao fechá-lo.
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        sys.exit(1)
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+
+"""
+test_gravacao.py — Reprodução das gravações do efeitos.py --record
+
+Descrição:
+    Reproduz os eventos de gravações asciicast com várias linhas num emulador de terminal
+    mínimo, em modo line feed (um '\\n' desce o cursor sem voltar à coluna 1, como nos
+    leitores de asciicast), e verifica que o ecrã depois de cada evento é igual ao frame
+    gravado. Corre com o pytest ou diretamente: ./tests/test_gravacao.py
+"""
+
+import os
+import sys
+import io
+import json
+import re
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+import efeitos
+
+# Sequências CSI (ESC [ parâmetros letra) reconhecidas pelo emulador
+CSI = re.compile(r'\x1b\[([?0-9;]*)([A-Za-z])')
+
+# Emulador de terminal mínimo: posição do cursor, limpeza de linha/ecrã e '\n' em modo line feed
+class Terminal:
+    def __init__(self, largura: int, altura: int):
+        self.largura = largura
+        self.altura = altura
+        self.ecra = [[' '] * largura for _ in range(altura)]
+        self.y = self.x = 0
+
+    def escrever(self, dados: str):
+        i = 0
+        while i < len(dados):
+            sequencia = CSI.match(dados, i)
+            if sequencia:
+                self.executar(sequencia.group(1), sequencia.group(2))
+                i = sequencia.end()
+                continue
+            caracter = dados[i]
+            if caracter == '\n':
+                self.y = min(self.y + 1, self.altura - 1)
+            elif caracter == '\r':
+                self.x = 0
+            elif self.x < self.largura:
+                self.ecra[self.y][self.x] = caracter
+                self.x += 1
+            i += 1
+
+    def executar(self, parametros: str, comando: str):
+        if parametros.startswith('?'): # Mostrar/esconder o cursor não muda o ecrã
+            return
+        valores = [int(v) if v else 0 for v in parametros.split(';')] if parametros else []
+        if comando == 'H':
+            linha = valores[0] if valores else 1
+            coluna = valores[1] if len(valores) > 1 else 1
+            self.y = min(max(linha, 1), self.altura) - 1
+            self.x = min(max(coluna, 1), self.largura) - 1
+        elif comando == 'K':
+            self.ecra[self.y][self.x:] = [' '] * (self.largura - self.x)
+        elif comando == 'J':
+            if valores and valores[0] == 2:
+                self.ecra = [[' '] * self.largura for _ in range(self.altura)]
+            else:
+                self.ecra[self.y][self.x:] = [' '] * (self.largura - self.x)
+                for y in range(self.y + 1, self.altura):
+                    self.ecra[y] = [' '] * self.largura
+
+    # Linhas do ecrã sem os espaços finais
+    def linhas(self) -> list[str]:
+        return [''.join(linha).rstrip() for linha in self.ecra]
+
+# Grava os frames em asciicast e compara o ecrã depois de cada evento com o frame correspondente
+def verificar_cast(frames: list[tuple[float, str]], diferencial: bool):
+    frames = efeitos.compactar_frames(frames)
+    largura = max(len(linha) for _, frame in frames for linha in frame.split('\n'))
+    altura = max(frame.count('\n') + 1 for _, frame in frames)
+
+    saida = io.StringIO()
+    efeitos.escrever_cast(frames, saida, largura, altura, 'teste', diferencial, None)
+    cabecalho, *eventos = [json.loads(linha) for linha in saida.getvalue().splitlines()]
+    assert cabecalho['version'] == 2
+
+    terminal = Terminal(cabecalho['width'], cabecalho['height'])
+    for (_, frame), (_, tipo, dados) in zip(frames, eventos):
+        assert tipo == 'o'
+        terminal.escrever(dados)
+        esperado = [linha.rstrip() for linha in frame.split('\n')]
+        esperado += [''] * (terminal.altura - len(esperado))
+        assert terminal.linhas() == esperado, (frame, terminal.linhas())
+
+def test_efeitos_varias_linhas():
+    for codigo in '12345':
+        for diferencial in (False, True):
+            verificar_cast(list(efeitos.frames_efeito(codigo, 'OLA MUNDO', 0.5)), diferencial)
+
+def test_compositor_varias_faixas():
+    faixas = [efeitos.Faixa('OLA', 3), efeitos.Faixa('MUNDO', 1, 'esquerda', 20), efeitos.Faixa('EFEITOS', 2, 'direita', 12)]
+    for diferencial in (False, True):
+        verificar_cast(list(efeitos.frames_faixas(faixas, 1 / 3, 300)), diferencial)
+
+if __name__ == '__main__':
+    test_efeitos_varias_linhas()
+    test_compositor_varias_faixas()
+    print("OK")